@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Generation benchmark of the resource modules: renders every resource
+module of a release with the Jinja template and with the code emitter
+(nothing is written), checks both outputs are identical and reports the
+time each backend takes.
+
+Usage: ``python benchbackends.py [-r R5] [--repeat N] [--spec-source DIR]``
+(the spec is taken from the download cache by default). Exits with 1 when
+an output differs."""
+import difflib
+import pathlib
+import sys
+import time
+
+import click
+import fhirspec
+
+import config
+import fhiranalysis
+import fhirstream
+import generate
+from fhirrenderer import FHIRStructureDefinitionRenderer
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+
+def measure(function, repeat):
+    """Returns the best time of ``repeat`` calls, and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+@click.command()
+@click.option(
+    "--fhir-release",
+    "-r",
+    type=click.Choice(["STU3", "R4", "R4B", "R5"], case_sensitive=True),
+    default=None,
+    help="FHIR Release",
+)
+@click.option("--repeat", default=5, show_default=True, help="Timed runs")
+@click.option(
+    "--spec-source",
+    default=None,
+    help="Directory of the specification, instead of the download cache",
+)
+def main(fhir_release: str, repeat: int, spec_source: str):
+    """ """
+    settings = fhirspec.Configuration.from_module(config)
+    if fhir_release is not None:
+        settings.update(
+            {
+                "CURRENT_RELEASE_NAME": fhir_release,
+                "SPECIFICATION_URL": "/".join([settings.FHIR_BASE_URL, fhir_release]),
+            }
+        )
+    if spec_source is None:
+        spec_source = generate.load(settings, force_download=False, cache_only=True)
+    spec = fhirstream.load_spec(settings, pathlib.Path(spec_source))
+    renderer = FHIRStructureDefinitionRenderer(
+        spec, settings, fhiranalysis.analyze(spec, settings)
+    )
+    modules = [
+        renderer.resource_data(profile)
+        for profile in renderer.get_analysis().profiles
+        if profile.classes
+    ]
+
+    outputs = dict()
+    for backend in ("jinja", "emitter"):
+        elapsed, outputs[backend] = measure(
+            lambda: [renderer.render_resource(data, backend) for data in modules],
+            repeat,
+        )
+        size = sum([len(output) for output in outputs[backend]])
+        sys.stdout.write(
+            "{0:<10} {1:>5} modules {2:>10.1f} KiB {3:>10.3f} s\n".format(
+                backend, len(modules), size / 1024, elapsed
+            )
+        )
+
+    failures = 0
+    for data, expected, emitted in zip(modules, outputs["jinja"], outputs["emitter"]):
+        if expected == emitted:
+            continue
+        failures += 1
+        name = data["profile"].targetname
+        sys.stdout.write("Outputs differ for {0}:\n".format(name))
+        sys.stdout.writelines(
+            list(
+                difflib.unified_diff(
+                    expected.splitlines(True),
+                    emitted.splitlines(True),
+                    "jinja/" + name,
+                    "emitter/" + name,
+                )
+            )[:40]
+        )
+    if failures:
+        sys.stdout.write("{0} modules differ\n".format(failures))
+        return 1
+    sys.stdout.write("Outputs are identical\n")
+    return 0
+
+
+if "__main__" == __name__:
+    sys.exit(main(standalone_mode=False))
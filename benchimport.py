@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Cold import benchmark of the generated package: imports every generated
+module in a fresh interpreter, once from the loose tree (with the ``.pyc``
+of ``__pycache__``) and once from the archive (see ``outputarchive``), and
+reports the best and median time of each.
+
+A slow filesystem (network or overlay mounts of containers) is simulated by
+adding ``--latency`` milliseconds to every ``stat``, ``listdir`` and ``open``
+made by the import system, the number of these calls is reported too. The
+dependencies (``--preload``) are imported before the clock starts, they are
+the same for both.
+
+Usage: ``python benchimport.py [--latency MS ...] [--repeat N]
+[--archive WHEEL] [--tree DIR]`` (the output of the configuration by
+default)."""
+import json
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+
+import click
+import fhirspec
+
+import config
+import outputarchive
+import outputcheck
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# imports the modules of argv[3:] with a simulated latency of argv[1] ms per
+# filesystem call, after the comma separated modules of argv[2]
+COLD_IMPORT_PROBE = """
+import _io, os, sys, time
+from importlib import _bootstrap_external
+
+latency = float(sys.argv[1]) / 1000
+for name in filter(None, sys.argv[2].split(",")):
+    __import__(name)
+calls = 0
+
+def slow(function):
+    def wrapper(*args, **kwargs):
+        global calls
+        calls += 1
+        if latency:
+            time.sleep(latency)
+        return function(*args, **kwargs)
+    return wrapper
+
+class SlowOS:
+    stat = staticmethod(slow(os.stat))
+    listdir = staticmethod(slow(os.listdir))
+    def __getattr__(self, name):
+        return getattr(os, name)
+
+_bootstrap_external._os = SlowOS()
+_io.open_code = slow(_io.open_code)
+start = time.perf_counter()
+for name in sys.argv[3:]:
+    __import__(name)
+elapsed = time.perf_counter() - start
+sys.stdout.write('{"seconds": %f, "calls": %d}' % (elapsed, calls))
+"""
+
+PRELOAD = ("pydantic", "fhir_core.fhirabstractmodel", "fhir_core.types")
+
+
+def cold_import(path, modules, latency, preload):
+    """Imports the modules in a fresh interpreter with ``path`` on
+    ``sys.path``, returns the elapsed time and the number of filesystem
+    calls (or the error)."""
+    env = outputcheck._python_env(pathlib.Path(path))
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    proc = subprocess.run(
+        [sys.executable, "-c", COLD_IMPORT_PROBE, str(latency), ",".join(preload)]
+        + modules,
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {
+            "error": lines[-1] if lines else "exit code {0}".format(proc.returncode)
+        }
+    return json.loads(proc.stdout)
+
+
+@click.command()
+@click.option(
+    "--latency",
+    multiple=True,
+    type=float,
+    default=(0, 1),
+    show_default=True,
+    help="Milliseconds added to every filesystem call (repeatable)",
+)
+@click.option("--repeat", default=5, show_default=True, help="Timed runs")
+@click.option("--archive", default=None, help="Wheel of the generated package")
+@click.option("--tree", default=None, help="Directory on sys.path of the package")
+@click.option(
+    "--preload",
+    multiple=True,
+    default=PRELOAD,
+    show_default=True,
+    help="Module imported before the clock starts (repeatable)",
+)
+def main(latency, repeat: int, archive: str, tree: str, preload):
+    """ """
+    settings = fhirspec.Configuration.from_module(config)
+    if tree is None:
+        tree, _ = outputcheck.module_root(settings)
+    if archive is None:
+        archive = outputarchive.archive_path(settings)
+    if not os.path.exists(archive):
+        sys.stderr.write(
+            "No archive {0}, generate with WRITE_ARCHIVE\n".format(archive)
+        )
+        return 1
+    modules = outputcheck.generated_modules(settings)
+
+    for milliseconds in latency:
+        for label, path in (("tree", tree), ("archive", archive)):
+            results = [
+                cold_import(path, modules, milliseconds, preload) for _ in range(repeat)
+            ]
+            errors = [result["error"] for result in results if "error" in result]
+            if errors:
+                sys.stderr.write(
+                    "Cannot import from {0}: {1}\n".format(path, errors[0])
+                )
+                return 1
+            seconds = [result["seconds"] for result in results]
+            sys.stdout.write(
+                "{0:>6.2f} ms {1:<8} {2:>5} modules {3:>8.3f} s best "
+                "{4:>8.3f} s median {5:>7} fs calls\n".format(
+                    milliseconds,
+                    label,
+                    len(modules),
+                    min(seconds),
+                    statistics.median(seconds),
+                    results[-1]["calls"],
+                )
+            )
+    return 0
+
+
+if "__main__" == __name__:
+    sys.exit(main(standalone_mode=False))
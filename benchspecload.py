@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Spec load benchmark: loads the specification in a fresh interpreter with
+the definition bundles read whole (``json.load``) and streamed entry by
+entry (see ``fhirstream``), reports the peak RSS and the time of each.
+
+Usage: ``python benchspecload.py [-r R5] [--spec-source DIR]`` (the spec is
+taken from the download cache by default)."""
+import json
+import os
+import subprocess
+import sys
+
+import click
+import fhirspec
+
+import config
+import generate
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# loads the spec of argv[1], streaming the bundles when argv[2] is "1"
+LOAD_PROBE = """
+import json, pathlib, resource, sys, time
+import config, fhirspec, fhirstream
+
+settings = fhirspec.Configuration.from_module(config)
+settings.update(
+    {"CURRENT_RELEASE_NAME": sys.argv[3], "STREAM_BUNDLES": sys.argv[2] == "1"}
+)
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+spec = fhirstream.load_spec(settings, pathlib.Path(sys.argv[1]))
+elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+sys.stdout.write(
+    json.dumps(
+        {"seconds": elapsed, "peak_kb": peak, "growth_kb": peak - before,
+         "profiles": len(spec.profiles)}
+    )
+)
+"""
+
+
+def load(spec_source: str, stream: bool, release: str):
+    """ """
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            LOAD_PROBE,
+            spec_source,
+            "1" if stream else "0",
+            release,
+        ],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {
+            "error": lines[-1] if lines else "exit code {0}".format(proc.returncode)
+        }
+    return json.loads(proc.stdout)
+
+
+@click.command()
+@click.option(
+    "--fhir-release",
+    "-r",
+    type=click.Choice(["STU3", "R4", "R4B", "R5"], case_sensitive=True),
+    default=None,
+    help="FHIR Release",
+)
+@click.option(
+    "--spec-source",
+    default=None,
+    help="Directory of the specification, instead of the download cache",
+)
+def main(fhir_release: str, spec_source: str):
+    """ """
+    settings = fhirspec.Configuration.from_module(config)
+    if fhir_release is not None:
+        settings.update(
+            {
+                "CURRENT_RELEASE_NAME": fhir_release,
+                "SPECIFICATION_URL": "/".join([settings.FHIR_BASE_URL, fhir_release]),
+            }
+        )
+    if spec_source is None:
+        spec_source = generate.load(settings, force_download=False, cache_only=True)
+
+    for label, stream in (("whole", False), ("streamed", True)):
+        result = load(str(spec_source), stream, settings.CURRENT_RELEASE_NAME)
+        if "error" in result:
+            sys.stderr.write("Cannot load the spec: {0}\n".format(result["error"]))
+            return 1
+        sys.stdout.write(
+            "{0:<9} {1:>5} profiles {2:>8.3f} s {3:>10.1f} MiB peak RSS "
+            "{4:>10.1f} MiB growth\n".format(
+                label,
+                result["profiles"],
+                result["seconds"],
+                result["peak_kb"] / 1024,
+                result["growth_kb"] / 1024,
+            )
+        )
+    return 0
+
+
+if "__main__" == __name__:
+    sys.exit(main(standalone_mode=False))
@@ -82,11 +82,21 @@ PREVIOUS_RELEASES = {"STU3", "R4B"}
 # specification_url
 SPECIFICATION_URL = "/".join([FHIR_BASE_URL, CURRENT_RELEASE_NAME])
 
+# stream_bundles
+# Whether to read the definition bundles entry by entry (see `fhirstream`)
+# instead of loading each whole JSON document, lowers the peak memory
+STREAM_BUNDLES = True
+
 # tpl_base
 # In which directory to find the templates.
 # See below for settings that start with `tpl_`: these are the template names.
 TEMPLATE_DIRECTORY = "templates"
 
+# watch_interval
+# with `generate.py --watch`, seconds between two polls of the templates and
+# of the configuration
+WATCH_INTERVAL = 0.25
+
 # write_resources
 # Whether and where to put the generated class models
 WRITE_RESOURCES = True
@@ -99,19 +109,208 @@ RESOURCE_TARGET_DIRECTORY = "../fhir/resources"
 # target class file name pattern, with one placeholder (`{}`) for the class name
 RESOURCE_FILE_NAME_PATTERN = "{}.py"
 
+# analysis_cache_file
+# where to keep the analysis of the specification (classes, fields and the
+# flags of the profiles the renderers share) between runs; `None` analyzes
+# on every run
+ANALYSIS_CACHE_FILE = None
+
 # tpl_resource_source
 # the template to use as source when writing resource implementations for profiles
 RESOURCE_SOURCE_TEMPLATE = "template-resource.jinja2"
 
+# resource_backend
+# how the resource modules are written: "jinja" renders
+# `RESOURCE_SOURCE_TEMPLATE`, "emitter" writes the same output with the
+# (faster) code emitter of `fhiremitter.py`, ignoring the template
+RESOURCE_BACKEND = "jinja"
+
 # tpl_codesystems_source
-# the template to use as source when writing enums for CodeSystems; can be `None`
-CODE_SYSTEMS_SOURCE_TEMPLATE = None
+# the template to use as source when writing the CodeSystem lookup tables;
+# can be `None`
+CODE_SYSTEMS_SOURCE_TEMPLATE = "template-codesystems.jinja2"
 
 # tpl_codesystems_target_name
 # the filename to use for the generated code systems and
 # value sets (in `RESOURCE_TARGET_DIRECTORY`)
 CODE_SYSTEMS_TARGET_NAME = "codesystems.py"
 
+# code_systems_compact_size
+# code systems with more concepts are looked up by binary search on their
+# packed codes instead of sets and dicts, to bound the memory use
+CODE_SYSTEMS_COMPACT_SIZE = 1000
+
+# write_reference_index
+# Whether to write the per class index of ``Reference`` element paths
+# (in `RESOURCE_TARGET_DIRECTORY`)
+WRITE_REFERENCE_INDEX = True
+
+# tpl_reference_index_source
+# the template to use for the reference index
+REFERENCE_INDEX_SOURCE_TEMPLATE = "template-references.jinja2"
+
+# tpl_reference_index_target_name
+# the filename to use for the generated reference index
+REFERENCE_INDEX_TARGET_NAME = "fhirreferences.py"
+
+# write_element_table
+# Whether to write the per class element tables and the path accessor
+# compiler built on them (in `RESOURCE_TARGET_DIRECTORY`)
+WRITE_ELEMENT_TABLE = True
+
+# tpl_element_table_source
+# the template to use for the element tables
+ELEMENT_TABLE_SOURCE_TEMPLATE = "template-elements.jinja2"
+
+# tpl_element_table_target_name
+# the filename to use for the generated element tables
+ELEMENT_TABLE_TARGET_NAME = "fhirelements.py"
+
+# tpl_accessors_source
+# the template to use for the path accessor compiler
+ACCESSORS_SOURCE_TEMPLATE = "template-accessors.jinja2"
+
+# tpl_accessors_target_name
+# the filename to use for the generated path accessor compiler
+ACCESSORS_TARGET_NAME = "fhiraccessors.py"
+
+# tpl_views_source
+# the template to use for the columnar flattening views (written with the
+# element tables), set to None to skip them
+VIEWS_SOURCE_TEMPLATE = "template-views.jinja2"
+
+# tpl_views_target_name
+# the filename to use for the generated flattening views
+VIEWS_TARGET_NAME = "fhirviews.py"
+
+# tpl_xml_source
+# the template to use for the streaming XML parser and serializer (written
+# with the element tables), set to None to skip it
+XML_SOURCE_TEMPLATE = "template-xml.jinja2"
+
+# tpl_xml_target_name
+# the filename to use for the generated XML parser and serializer
+XML_TARGET_NAME = "fhirxml.py"
+
+# tpl_canonical_source
+# the template to use for the canonical JSON serializer and content hashing
+# (written with the element tables), set to None to skip it
+CANONICAL_SOURCE_TEMPLATE = "template-canonical.jinja2"
+
+# tpl_canonical_target_name
+# the filename to use for the generated canonical JSON serializer
+CANONICAL_TARGET_NAME = "fhircanonical.py"
+
+# tpl_fhirpath_source
+# the template to use for the FHIRPath expression compiler (written with
+# the element tables), set to None to skip it
+FHIRPATH_SOURCE_TEMPLATE = "template-fhirpath.jinja2"
+
+# tpl_fhirpath_target_name
+# the filename to use for the generated FHIRPath expression compiler
+FHIRPATH_TARGET_NAME = "fhirpath.py"
+
+# tpl_lite_source
+# the template to use for the lightweight read-only models, frozen
+# `__slots__` classes decoded from JSON without validation (written with the
+# element tables), set to None to skip them
+LITE_SOURCE_TEMPLATE = "template-lite.jinja2"
+
+# tpl_lite_target_name
+# the filename to use for the generated read-only models
+LITE_TARGET_NAME = "fhirlite.py"
+
+# tpl_intern_source
+# the template to use for the opt-in string interning of low-cardinality
+# values while parsing (written with the element tables), set to None to
+# skip it
+INTERN_SOURCE_TEMPLATE = "template-intern.jinja2"
+
+# tpl_intern_target_name
+# the filename to use for the generated string interning
+INTERN_TARGET_NAME = "fhirintern.py"
+
+# intern_types
+# the element types (class names) whose values are interned
+INTERN_TYPES = ["Uri", "Canonical", "Code"]
+
+# intern_excluded
+# elements of those types which are not interned (`Class.jsonName`), their
+# values are unique and would only fill the intern table
+INTERN_EXCLUDED = ["BundleEntry.fullUrl"]
+
+# lazy_primitives
+# whether the dateTime, instant, decimal and base64Binary elements keep their
+# validated lexical form and convert to datetime/Decimal/bytes only on first
+# access of `value` (see templates/fhirlazy.py), re-serializing emits the
+# original lexical form
+LAZY_PRIMITIVES = False
+
+# tpl_payload_source
+# the template to use for the zero-copy handling of large base64Binary values
+# (`Attachment.data`, `Binary.data`...), kept as slices of the input buffer
+# or spilled to temporary files (written with the element tables, needs
+# `LAZY_PRIMITIVES`), set to None to skip it
+PAYLOAD_SOURCE_TEMPLATE = "template-payload.jinja2"
+
+# tpl_payload_target_name
+# the filename to use for the generated large payload handling
+PAYLOAD_TARGET_NAME = "fhirpayload.py"
+
+# payload_threshold
+# default size of the base64 text from which a value is kept as a payload
+PAYLOAD_THRESHOLD = 65536
+
+# payload_spill_threshold
+# default size of the base64 text from which a payload is copied to a
+# temporary file, None to keep every payload in the input buffer
+PAYLOAD_SPILL_THRESHOLD = None
+
+# write_search_parameters
+# Whether to write the search parameter extractors, translated from the
+# FHIRPath expressions of the search parameters (needs the element tables
+# and the FHIRPath compiler)
+WRITE_SEARCH_PARAMETERS = True
+
+# search_parameters_file_name
+# the bundle of search parameter definitions in the spec
+SEARCH_PARAMETERS_FILE_NAME = "search-parameters.json"
+
+# tpl_search_parameters_source
+# the template to use for the search parameter extractors
+SEARCH_PARAMETERS_SOURCE_TEMPLATE = "template-searchparameters.jinja2"
+
+# tpl_search_parameters_target_name
+# the filename to use for the generated search parameter extractors
+SEARCH_PARAMETERS_TARGET_NAME = "fhirsearch.py"
+
+# write_invariants
+# Whether to write the invariant checkers, translated from the FHIRPath
+# expressions of the element constraints (needs the element tables and the
+# FHIRPath compiler)
+WRITE_INVARIANTS = True
+
+# tpl_invariants_source
+# the template to use for the invariant checkers
+INVARIANTS_SOURCE_TEMPLATE = "template-invariants.jinja2"
+
+# tpl_invariants_target_name
+# the filename to use for the generated invariant checkers
+INVARIANTS_TARGET_NAME = "fhirinvariants.py"
+
+# write_bindings
+# Whether to write the expansions of the value sets of the required
+# bindings, per class and element (needs the element tables)
+WRITE_BINDINGS = True
+
+# tpl_bindings_source
+# the template to use for the required bindings
+BINDINGS_SOURCE_TEMPLATE = "template-bindings.jinja2"
+
+# tpl_bindings_target_name
+# the filename to use for the generated required bindings
+BINDINGS_TARGET_NAME = "fhirbindings.py"
+
 # write_factory
 # Whether and where to put the factory methods and the dependency graph
 WRITE_FACTORY = True
@@ -135,6 +334,68 @@ DEPENDENCIES_SOURCE_TEMPLATE = "template-dependencies.json"
 # write dependency JSON to project root
 DEPENDENCIES_TARGET_FILE_NAME = "./dependencies.json"
 
+# compile_generated
+# Whether to byte-compile all generated modules after writing (in parallel),
+# the `.pyc` files are kept; modules which cannot be compiled are reported
+# with the profile they were rendered from and make the generation fail
+COMPILE_GENERATED = True
+
+# smoke_import_generated
+# Whether to also import every generated module alone in a fresh interpreter
+SMOKE_IMPORT_GENERATED = False
+
+# compile_workers
+# number of processes used to compile/import, None for the number of CPUs
+COMPILE_WORKERS = None
+
+# import_profile
+# Whether to import every generated module in a clean subprocess after
+# writing, recording import time (`-X importtime`), RSS growth and module
+# namespace size per module
+IMPORT_PROFILE = False
+
+# import_profile_report
+# where to write the per module import profile (JSON), the release name is
+# appended to the file name (i.e `import-profile-R5.json`)
+IMPORT_PROFILE_REPORT = "./import-profile.json"
+
+# import_profile_baseline
+# a previous import profile to compare with, regressions are reported as
+# errors and make the generation fail (None to not compare); like the report
+# the release name is appended, each release is compared with its own one
+IMPORT_PROFILE_BASELINE = None
+
+# import_profile_thresholds
+# per measure, (ratio, minimum difference) both exceeded for a regression
+IMPORT_PROFILE_THRESHOLDS = {
+    "import_us": (1.25, 20000),
+    "rss_kb": (1.25, 2048),
+    "size_bytes": (1.25, 65536),
+}
+
+# import_profile_workers
+# number of modules profiled concurrently (more is faster but noisier)
+IMPORT_PROFILE_WORKERS = 1
+
+# write_archive
+# Whether to also pack the generated package (with the `__init__` and the
+# unit tests written inside it) into one wheel, with precompiled modules,
+# which installs with pip or imports as it is from `sys.path` (zipimport);
+# written again after every release, with the previous releases built so far
+WRITE_ARCHIVE = False
+
+# archive_target_directory
+# where to write the wheel
+ARCHIVE_TARGET_DIRECTORY = "./dist"
+
+# archive_version
+# version of the wheel, None for the FHIR version of the generated package
+ARCHIVE_VERSION = None
+
+# archive_requirements
+# the requirements of the wheel
+ARCHIVE_REQUIREMENTS = ["fhir-core"]
+
 # write_unittests
 # Whether and where to write unit tests
 WRITE_UNITTESTS = True
@@ -152,10 +413,45 @@ UNITTEST_TARGET_DIRECTORY = "../tmp/fhir/resources/tests"
 # will be the class name
 UNITTEST_TARGET_FILE_NAME_PATTERN = "test_{}.py"
 
+# write_benchmarks
+# Whether to write the performance benchmark suite of the models over the
+# unit test examples (in `UNITTEST_TARGET_DIRECTORY`, needs `WRITE_UNITTESTS`)
+WRITE_BENCHMARKS = True
+
+# tpl_benchmark_source
+# the template to use for the benchmark suite
+BENCHMARK_SOURCE_TEMPLATE = "template-benchmark.jinja2"
+
+# tpl_benchmark_target_name
+# the filename to use for the generated benchmark suite
+BENCHMARK_TARGET_NAME = "bench_models.py"
+
 # unittest_copyfiles
 # array of file names to copy to the test directory
 # `UNITTEST_TARGET_DIRECTORY` (e.g. unit test base classes)
-UNITTEST_COPY_FILES = ["templates/conftest.py", "templates/fixtures.py"]
+UNITTEST_COPY_FILES = [
+    "templates/conftest.py",
+    "templates/fixtures.py",
+    "templates/sharding.py",
+    "templates/test_fhirviews.py",
+    "templates/test_fhirinvariants.py",
+    "templates/test_fhirpayload.py",
+    "templates/benchutils.py",
+    "templates/bench_references.py",
+    "templates/bench_accessors.py",
+    "templates/bench_views.py",
+    "templates/bench_xml.py",
+    "templates/bench_canonical.py",
+    "templates/bench_fhirpath.py",
+    "templates/bench_search.py",
+    "templates/bench_invariants.py",
+    "templates/bench_codesystems.py",
+    "templates/bench_bindings.py",
+    "templates/bench_lite.py",
+    "templates/bench_intern.py",
+    "templates/bench_lazy.py",
+    "templates/bench_payload.py",
+]
 
 # unittest_format_path_prepare
 # used to format `path` before appending another path
@@ -233,6 +529,8 @@ MANUAL_PROFILES = [
         "fhirprimitiveextension",
         ["FHIRPrimitiveExtension"],
     ),
+    ("templates/fhirpathparser.py", "fhirpathparser", []),
+    ("templates/fhirlazy.py", "fhirlazy", []),
     ("templates/fhirtypes.py", "fhirtypes", FHIR_PRIMITIVES),
 ]
 RESOURCES_WRITER_CLASS = "utils.ResourceWriter"
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Analysis stage of the generator: the classes of the specification, their
+fields (with the rendering decisions: field types, primitive extensions,
+enums, release specific fixes) and the imports and flags of every profile,
+computed once per release into immutable tuples the renderers share.
+
+The analysis holds no reference to the ``fhirspec`` objects, it can be
+pickled (i.e. cached on disk or handed to parallel render workers).
+"""
+import pickle
+import typing
+
+from fhirspec import FHIR_CLASS_TYPES, FHIRClass
+
+from logger import logger
+from valuesetexpansion import ValueSetExpander, required_bindings
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# changes whenever the analysis (its tuples or their computation) changes,
+# invalidates the cached analyses
+FORMAT = 2
+
+
+class ClassRef(typing.NamedTuple):
+    name: str
+    module: typing.Optional[str]
+
+
+class FieldIR(typing.NamedTuple):
+    """A property of a class, as rendered."""
+
+    name: str
+    orig_name: str
+    # path of the element, i.e ``Observation.value[x]``
+    path: str
+    class_name: str
+    type_name: str
+    field_type: str
+    field_type_module: typing.Optional[str]
+    is_array: bool
+    is_native: bool
+    is_primitive: bool
+    is_summary: bool
+    nonoptional: bool
+    need_primitive_ext: bool
+    one_of_many: typing.Optional[str]
+    enum: typing.Tuple[str, ...]
+    reference_to_names: typing.Tuple[str, ...]
+    short: typing.Optional[str]
+    formal: typing.Optional[str]
+
+
+class ClassIR(typing.NamedTuple):
+    name: str
+    path: typing.Optional[str]
+    module: typing.Optional[str]
+    # one of ``FHIR_CLASS_TYPES``
+    class_type: str
+    superclass: typing.Optional[ClassRef]
+    resource_type: typing.Optional[str]
+    short: typing.Optional[str]
+    formal: typing.Optional[str]
+    # own properties, sorted by name
+    properties: typing.Tuple[FieldIR, ...]
+    # element names (own and inherited) in the specification's order
+    expanded_properties_sequence: typing.Tuple[str, ...]
+    expanded_summary_properties_sequence: typing.Tuple[str, ...]
+    # (choice name, field names) of the choice elements
+    one_of_many_fields: typing.Tuple[typing.Tuple[str, typing.Tuple[str, ...]], ...]
+    # (field JSON name, extension field JSON name) of the required primitives
+    required_primitive_fields: typing.Tuple[
+        typing.Tuple[str, typing.Optional[str]], ...
+    ]
+
+
+class ProfileIR(typing.NamedTuple):
+    name: str
+    url: typing.Optional[str]
+    targetname: typing.Optional[str]
+    kind: typing.Optional[str]
+    fhir_version: typing.Optional[str]
+    fhir_last_updated: typing.Optional[str]
+    # writable classes, sorted by name
+    classes: typing.Tuple[ClassIR, ...]
+    # classes of other modules needed by the classes
+    imports: typing.Tuple[ClassRef, ...]
+    # external class names referenced by the classes
+    references: typing.Tuple[str, ...]
+    need_fhirtypes: bool
+    need_pydantic_field: bool
+    need_typing: bool
+    need_union_type: bool
+    need_root_validator: bool
+    has_array_type: bool
+    has_one_of_many: bool
+    has_required_primitive_element: bool
+
+
+class ReleaseIR(typing.NamedTuple):
+    format: int
+    release_name: str
+    version: typing.Optional[str]
+    build: typing.Optional[str]
+    profiles: typing.Tuple[ProfileIR, ...]
+    # resource, complex type and logical classes, sorted by name
+    classes: typing.Tuple[ClassIR, ...]
+
+    def get_class(self, name: str) -> typing.Optional[ClassIR]:
+        """ """
+        for klass in self.classes:
+            if klass.name == name:
+                return klass
+        return None
+
+    def get_profile(self, name: str) -> typing.Optional[ProfileIR]:
+        """Returns a profile by name (case insensitive)."""
+        for profile in self.profiles:
+            if profile.name.lower() == name.lower():
+                return profile
+        return None
+
+    def chain(self, name: str) -> typing.List[ClassIR]:
+        """Returns a class and its superclasses, the root class first."""
+        classes = dict([(klass.name, klass) for klass in self.classes])
+        chain: typing.List[ClassIR] = list()
+        klass = classes.get(name)
+        while klass is not None and klass not in chain:
+            chain.insert(0, klass)
+            klass = classes.get(klass.superclass.name) if klass.superclass else None
+        return chain
+
+    def expanded_properties(self, name: str) -> typing.List[FieldIR]:
+        """Returns all properties of a class including the inherited ones,
+        superclass properties first."""
+        properties: typing.List[FieldIR] = list()
+        for klass in self.chain(name):
+            properties.extend(klass.properties)
+        return properties
+
+
+def analyze_property(klass, prop, release_name, enums) -> FieldIR:
+    """ """
+    class_name, field_type, type_name = prop.class_name, prop.field_type, prop.type_name
+    if (
+        klass.name in ("Resource",)
+        and release_name == "R4"
+        and class_name == "String"
+        and prop.name == "id"
+    ):
+        # we force Resource.id type = Id
+        class_name = field_type = "Id"
+        type_name = "id"
+
+    # Issue https://github.com/nazrulworld/fhir.resources/pull/160
+    if (
+        klass.name in ("Element",)
+        and release_name == "R4B"
+        and class_name == "Id"
+        and prop.name == "id"
+    ):
+        class_name = field_type = "String"
+
+    need_primitive_ext = False
+    field_type_module = prop.field_type_module
+    prop_klass = FHIRClass.with_name(class_name)
+    if prop_klass.class_type in (
+        FHIR_CLASS_TYPES.resource,
+        FHIR_CLASS_TYPES.logical,
+        FHIR_CLASS_TYPES.complex_type,
+    ):
+        field_type = class_name + "Type"
+    elif (
+        prop_klass.class_type == FHIR_CLASS_TYPES.primitive_type or prop.is_native
+    ) and prop.name != "id":
+        need_primitive_ext = True
+
+    if prop_klass.class_type != FHIR_CLASS_TYPES.other:
+        field_type_module = "fhirtypes"
+
+    # Check Enums
+    enum: typing.List[str] = list()
+    codes = enums(prop.path) if field_type == "Code" else None
+    if codes and len(set([system for system, _ in codes])) == 1:
+        # in the order of the expansion, like the short description has them
+        enum = list(dict.fromkeys([code for _, code in codes]))
+    elif field_type == "Code" and prop.short and "|" in prop.short:
+        for item in map(lambda x: x.strip(), prop.short.split("|")):
+            parts = item.split(" ")
+            enum.append(parts[0])
+            if len(parts) == 2 and parts[1] == "+":
+                enum.append(parts[1])
+
+    # Fix Primitives Types
+    if prop_klass.class_type == FHIR_CLASS_TYPES.primitive_type:
+        if not field_type.endswith("Type"):
+            field_type += "Type"
+
+    return FieldIR(
+        name=prop.name,
+        orig_name=prop.orig_name,
+        path=prop.path,
+        class_name=class_name,
+        type_name=type_name,
+        field_type=field_type,
+        field_type_module=field_type_module,
+        is_array=prop.is_array,
+        is_native=prop.is_native,
+        is_primitive=prop.is_native
+        or prop_klass.class_type == FHIR_CLASS_TYPES.primitive_type,
+        is_summary=prop.is_summary,
+        nonoptional=prop.nonoptional,
+        need_primitive_ext=need_primitive_ext,
+        one_of_many=prop.one_of_many,
+        enum=tuple(enum),
+        reference_to_names=tuple(prop.reference_to_names),
+        short=prop.short,
+        formal=prop.formal,
+    )
+
+
+def analyze_class(klass, release_name, enums) -> ClassIR:
+    """ """
+    properties = tuple(
+        [
+            analyze_property(klass, prop, release_name, enums)
+            for prop in klass.properties
+        ]
+    )
+    one_of_many: typing.Dict[str, typing.List[str]] = dict()
+    required = list()
+    for prop in properties:
+        if prop.one_of_many:
+            one_of_many.setdefault(prop.one_of_many, list()).append(prop.name)
+        # check non-optional primitive element
+        if prop.need_primitive_ext and prop.nonoptional and not prop.one_of_many:
+            if klass.name == "Extension":
+                required.append((prop.orig_name, None))
+            else:
+                required.append((prop.orig_name, prop.orig_name + "__ext"))
+    superclass = klass.superclass
+    return ClassIR(
+        name=klass.name,
+        path=klass.path,
+        module=klass.module,
+        class_type=klass.class_type.value,
+        superclass=(
+            ClassRef(superclass.name, superclass.module)
+            if superclass is not None
+            else None
+        ),
+        resource_type=klass.resource_type,
+        short=klass.short,
+        formal=klass.formal,
+        properties=properties,
+        expanded_properties_sequence=tuple(klass.expanded_properties_sequence),
+        expanded_summary_properties_sequence=tuple(
+            klass.expanded_summary_properties_sequence
+        ),
+        one_of_many_fields=tuple(
+            [(name, tuple(fields)) for name, fields in one_of_many.items()]
+        ),
+        required_primitive_fields=tuple(required),
+    )
+
+
+def analyze_profile(profile, classes) -> ProfileIR:
+    """ """
+    properties = [prop for klass in classes for prop in klass.properties]
+    has_one_of_many = any([prop.one_of_many for prop in properties])
+    has_required_primitive_element = any(
+        [klass.required_primitive_fields for klass in classes]
+    )
+    has_array_type = any([prop.is_array for prop in properties])
+    if classes:
+        imports = tuple(
+            [
+                ClassRef(klass.name, klass.module)
+                for klass in profile.needed_external_classes()
+            ]
+        )
+        references = tuple(profile.referenced_classes())
+    else:
+        imports = references = tuple()
+    return ProfileIR(
+        name=profile.name,
+        url=profile.url,
+        targetname=profile.targetname,
+        kind=profile.structure.kind if profile.structure else None,
+        fhir_version=profile.fhir_version,
+        fhir_last_updated=profile.fhir_last_updated,
+        classes=tuple(classes),
+        imports=imports,
+        references=references,
+        need_fhirtypes=any([not prop.is_native for prop in properties]),
+        need_pydantic_field=len(properties) > 0,
+        need_typing=has_one_of_many or has_required_primitive_element or has_array_type,
+        need_union_type=any(
+            [prop.need_primitive_ext and prop.is_array for prop in properties]
+        ),
+        need_root_validator=has_one_of_many or has_required_primitive_element,
+        has_array_type=has_array_type,
+        has_one_of_many=has_one_of_many,
+        has_required_primitive_element=has_required_primitive_element,
+    )
+
+
+def analyze(spec, settings) -> ReleaseIR:
+    """Analyzes the writable profiles of a specification."""
+    release_name = settings.CURRENT_RELEASE_NAME
+    # enums of the code elements are the expansions of their required
+    # bindings when available, else taken from their short description
+    expander = ValueSetExpander(spec)
+    bindings = required_bindings(spec)
+
+    def enums(path):
+        return expander.expand(bindings[path]) if path in bindings else None
+
+    writable = dict()
+    for profile in spec.writable_profiles():
+        writable[profile.name] = sorted(
+            profile.writable_classes(), key=lambda x: x.name
+        )
+    analyzed = dict()
+    for klass in FHIRClass.__known_classes__.values():
+        if klass.class_type in (
+            FHIR_CLASS_TYPES.resource,
+            FHIR_CLASS_TYPES.complex_type,
+            FHIR_CLASS_TYPES.logical,
+        ) or any([klass in classes for classes in writable.values()]):
+            analyzed[klass.name] = analyze_class(klass, release_name, enums)
+
+    profiles = list()
+    for profile in spec.writable_profiles():
+        classes = [analyzed[klass.name] for klass in writable[profile.name]]
+        profiles.append(analyze_profile(profile, classes))
+    classes = [
+        klass
+        for klass in analyzed.values()
+        if klass.class_type
+        in (
+            FHIR_CLASS_TYPES.resource,
+            FHIR_CLASS_TYPES.complex_type,
+            FHIR_CLASS_TYPES.logical,
+        )
+    ]
+    logger.info(
+        "Analyzed {0} classes of {1} profiles".format(len(analyzed), len(profiles))
+    )
+    return ReleaseIR(
+        format=FORMAT,
+        release_name=release_name,
+        version=spec.info.version,
+        build=spec.info.build,
+        profiles=tuple(profiles),
+        classes=tuple(sorted(classes, key=lambda x: x.name)),
+    )
+
+
+def save(analysis: ReleaseIR, path) -> None:
+    """ """
+    with open(path, "wb") as handle:
+        pickle.dump(analysis, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(path, spec, settings) -> typing.Optional[ReleaseIR]:
+    """Returns the analysis cached at ``path`` if it matches the release of
+    the specification, None otherwise."""
+    try:
+        with open(path, "rb") as handle:
+            analysis = pickle.load(handle)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return None
+    if not isinstance(analysis, ReleaseIR) or (
+        analysis.format,
+        analysis.release_name,
+        analysis.version,
+        analysis.build,
+    ) != (FORMAT, settings.CURRENT_RELEASE_NAME, spec.info.version, spec.info.build):
+        return None
+    return analysis
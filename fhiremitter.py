@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Writes the resource modules straight from the analysis (see
+``fhiranalysis``) with a string builder, an alternative to rendering
+``template-resource.jinja2``. The output is identical to the template's,
+byte for byte; ``benchbackends.py`` checks it and compares their speed."""
+import json
+import typing
+from functools import lru_cache
+from textwrap import TextWrapper
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+DISCLAIMER = (
+    '    """Disclaimer: Any field name ends with ``__ext`` doesn\'t part of\n'
+    "    Resource StructureDefinition, instead used to enable Extensibility feature\n"
+    "    for FHIR Primitive Data Types.\n\n    "
+)
+
+REQUIRED_FIELDS = '''
+    def get_required_fields(self) -> typing.List[typing.Tuple[str, str]]:
+        """https://www.hl7.org/fhir/extensibility.html#Special-Case
+        In some cases, implementers might find that they do not have appropriate data for
+        an element with minimum cardinality = 1. In this case, the element must be present,
+        but unless the resource or a profile on it has made the actual value of the primitive
+        data type mandatory, it is possible to provide an extension that explains why
+        the primitive value is not present.
+        """
+        required_fields = ['''
+
+ONE_OF_MANY_FIELDS = '''
+    def get_one_of_many_fields(self) -> typing.Dict[str, typing.List[str]]:
+        """https://www.hl7.org/fhir/formats.html#choice
+        A few elements have a choice of more than one data type for their content.
+        All such elements have a name that takes the form nnn[x].
+        The "nnn" part of the name is constant, and the "[x]" is replaced with
+        the title-cased name of the type that is actually used.
+        The table view shows each of these names explicitly.
+
+        Elements that have a choice of data type cannot repeat - they must have a
+        maximum cardinality of 1. When constructing an instance of an element with a
+        choice of types, the authoring system must create a single element with a
+        data type chosen from among the list of permitted data types.
+        """
+        one_of_many_fields = {'''
+
+
+@lru_cache(maxsize=None)
+def _wrapper(width: int, docstring: bool) -> TextWrapper:
+    """The wrappers of the ``wordwrap`` filter (docstrings) and of the
+    ``string_wrap`` filter (string literals), created once per width."""
+    if docstring:
+        return TextWrapper(width=width, expand_tabs=False, replace_whitespace=False)
+    return TextWrapper(
+        width=width, replace_whitespace=True, drop_whitespace=False, tabsize=4
+    )
+
+
+def wordwrap(value: str, width: int, wrapstring: str) -> str:
+    """Same as Jinja's ``wordwrap`` filter."""
+    wrapper = _wrapper(width, True)
+    return wrapstring.join(
+        [wrapstring.join(wrapper.wrap(line)) for line in value.splitlines()]
+    )
+
+
+@lru_cache(maxsize=4096)
+def string_literal(value: str, width: int) -> str:
+    """Same as the ``pep8_string_wrap`` macro: the JSON string literals of the
+    wrapped value, in parentheses when there are several."""
+    lines = [json.dumps(line) for line in _wrapper(width, False).wrap(value)]
+    if len(lines) == 1:
+        return lines[0]
+    return "(\n    " + "".join([line + "\n    " for line in lines]) + ")"
+
+
+def tojson(value) -> str:
+    """Same as Jinja's ``tojson`` filter."""
+    return (
+        json.dumps(value, sort_keys=True)
+        .replace("<", "\\u003c")
+        .replace(">", "\\u003e")
+        .replace("&", "\\u0026")
+        .replace("'", "\\u0027")
+    )
+
+
+class ResourceModuleEmitter:
+    """Emits the source of the resource module of a profile from the same
+    data as the template."""
+
+    def __init__(self, data: typing.Dict[str, typing.Any]):
+        self.data = data
+        self.parts: typing.List[str] = list()
+
+    def emit(self) -> str:
+        """ """
+        self.header()
+        self.imports()
+        for klass in self.data["classes"]:
+            self.klass(klass)
+        self.parts.append("\n")
+        return "".join(self.parts)
+
+    def header(self):
+        """ """
+        profile, info = self.data["profile"], self.data["info"]
+        write = self.parts.append
+        write('"""\nProfile: ')
+        write(str(profile.url))
+        write("\nRelease: ")
+        write(str(self.data["release_name"]))
+        write("\nVersion: ")
+        write(str(profile.fhir_version))
+        if info.build:
+            write("\nBuild ID: ")
+            write(str(info.build))
+        elif info.revision:
+            write("\nRevision: ")
+            write(str(info.revision))
+        write("\nLast updated: ")
+        write(str(profile.fhir_last_updated))
+        write(
+            '\n"""\n\nfrom __future__ import annotations as _annotations\n\nimport typing'
+        )
+
+    def imports(self):
+        """ """
+        write = self.parts.append
+        if self.data["need_pydantic_field"]:
+            write("\nfrom pydantic import Field\n")
+        if self.data["need_fhirtypes"]:
+            write("\nfrom . import fhirtypes\n")
+        imported = set()
+        for klass in self.data["classes"]:
+            write("\n")
+            superclass = klass.superclass
+            if superclass in self.data["imports"] and superclass.module not in imported:
+                if superclass.module == "fhirabstractmodel":
+                    write("from fhir_core import ")
+                else:
+                    write("from . import ")
+                write(str(superclass.module))
+                write("\n\n")
+                imported.add(superclass.module)
+
+    def klass(self, klass):
+        """ """
+        write = self.parts.append
+        superclass = klass.superclass
+        write("\nclass ")
+        write(klass.name)
+        write("(")
+        if superclass in self.data["imports"]:
+            write(str(superclass.module))
+            write(".")
+        write(superclass.name if superclass is not None else "object")
+        write("):\n")
+        write(DISCLAIMER)
+        write(wordwrap(klass.short, 75, "\n    "))
+        write(".")
+        if klass.formal:
+            write("\n    ")
+            write(wordwrap(klass.formal, 75, "\n    "))
+        write('\n    """')
+        if klass.resource_type:
+            write('\n    __resource_type__ = "')
+            write(klass.resource_type)
+            write('"')
+        for prop in klass.properties:
+            self.field(klass, prop)
+        write(
+            "\n    @classmethod\n"
+            "    def elements_sequence(cls) -> typing.List[str]:\n"
+            '        """returning all element names from\n'
+            "        ``"
+        )
+        write(klass.name)
+        write(
+            "`` according to specification,\n"
+            "        with preserving the original sequence order.\n"
+            '        """\n'
+            "        return "
+        )
+        write(tojson(klass.expanded_properties_sequence))
+        write(
+            "\n\n    @classmethod\n"
+            "    def summary_elements_sequence(cls) -> typing.List[str]:\n"
+            '        """returning all element names (those have summary mode are '
+            "enabled) from ``"
+        )
+        write(klass.name)
+        write(
+            "`` according to specification,\n"
+            "        with preserving the original sequence order.\n"
+            '        """\n'
+            "        return "
+        )
+        write(tojson(klass.expanded_summary_properties_sequence))
+        write("\n\n")
+        if klass.required_primitive_fields:
+            write(REQUIRED_FIELDS)
+            last = len(klass.required_primitive_fields) - 1
+            for index, (field, ext_field) in enumerate(klass.required_primitive_fields):
+                write('\n            ("')
+                write(field)
+                write('", ')
+                if ext_field:
+                    write('"')
+                    write(ext_field)
+                    write('" )')
+                else:
+                    write(" None )")
+                if index != last:
+                    write(",")
+            write("]\n        return required_fields\n")
+        if klass.one_of_many_fields:
+            write(ONE_OF_MANY_FIELDS)
+            last = len(klass.one_of_many_fields) - 1
+            for index, (prefix, fields) in enumerate(klass.one_of_many_fields):
+                write('\n            "')
+                write(prefix)
+                write('": [')
+                write(
+                    ",".join(['\n                "' + field + '"' for field in fields])
+                )
+                write("]")
+                if index != last:
+                    write(",")
+            write("}\n        return one_of_many_fields\n")
+
+    def field(self, klass, prop):
+        """ """
+        write = self.parts.append
+        if prop.field_type_module:
+            type_klass = prop.field_type_module + "." + prop.field_type
+        else:
+            type_klass = prop.field_type
+        if prop.is_array:
+            if prop.need_primitive_ext:
+                type_klass = "typing.List[" + type_klass + " | None]"
+            else:
+                type_klass = "typing.List[" + type_klass + "]"
+        required = (
+            prop.nonoptional and not prop.one_of_many and not prop.need_primitive_ext
+        )
+        write("\n    \n    ")
+        write(prop.name)
+        write(": ")
+        write(type_klass)
+        write(
+            " = Field(\n        default=...,"
+            if required
+            else " | None = Field(\n        default=None,"
+        )
+        write('\n        alias="')
+        write(prop.orig_name)
+        write('",\n        title=')
+        write(string_literal(prop.short, 70) if prop.short else "None")
+        write(",\n        description=")
+        write(string_literal(prop.formal, 70) if prop.formal else "None")
+        write(',\n        json_schema_extra={\n        "element_property": True,')
+        if prop.is_summary:
+            write('\n        "summary_element_property": True,')
+        if prop.nonoptional and not prop.one_of_many and prop.need_primitive_ext:
+            write('\n        "element_required": True,')
+        if prop.one_of_many:
+            write("\n        # Choice of Data Types. i.e ")
+            write(prop.one_of_many)
+            write('[x]\n        "one_of_many": "')
+            write(prop.one_of_many)
+            write('",\n        "one_of_many_required": ')
+            write("True," if prop.nonoptional else "False,")
+        if len(prop.enum) > 0:
+            write(
+                "\n        # note: Enum values can be used in validation,"
+                "\n        # but use in your own responsibilities, read official FHIR "
+                'documentation.\n        "enum_values": '
+            )
+            write(tojson(prop.enum))
+            write(",")
+        if len(prop.reference_to_names) > 0:
+            write(
+                "\n        # note: Listed Resource Type(s) should be allowed as "
+                'Reference.\n        "enum_reference_types": '
+            )
+            write(tojson(prop.reference_to_names))
+            write(",")
+        write("\n        }\n    )")
+        if prop.need_primitive_ext and klass.name != "Extension":
+            write("\n    ")
+            write(prop.orig_name)
+            if prop.is_array:
+                write(
+                    "__ext: typing.List[fhirtypes.FHIRPrimitiveExtensionType | None]"
+                    " | None = Field("
+                )
+            else:
+                write("__ext: fhirtypes.FHIRPrimitiveExtensionType | None = Field(")
+            write('\n        default=None,\n        alias="_')
+            write(prop.orig_name)
+            write('",\n        title="Extension field for ``')
+            write(prop.name)
+            write('``."\n    )')
+
+
+def emit_resource_module(data: typing.Dict[str, typing.Any]) -> str:
+    """Returns the source of a resource module, see ``ResourceModuleEmitter``."""
+    return ResourceModuleEmitter(data).emit()
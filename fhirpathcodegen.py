@@ -0,0 +1,641 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Translates FHIRPath expressions (of the search parameters and of the
+invariants) into Python source, specialized with the element tables of the
+generated classes. The expressions are parsed with
+``templates/fhirpathparser.py``, the parser shipped with the generated
+package."""
+import importlib.util
+import itertools
+import json
+import pathlib
+import typing
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+
+def _load_parser():
+    """ """
+    filepath = pathlib.Path(__file__).parent / "templates" / "fhirpathparser.py"
+    spec = importlib.util.spec_from_file_location("fhirpathparser", filepath)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+fhirpathparser = _load_parser()
+
+# base resources, their elements are shared by every resource
+ABSTRACT_TYPES = ("Resource", "DomainResource")
+
+# (search parameter type, element type): statement adding the index value(s)
+# of ``{v}``, the other combinations use the generic converter of the type
+LEAVES = {
+    ("token", "coding"): "found.append(Token({v}.system, {v}.code))",
+    ("token", "codeableconcept"): "found.extend(concept_tokens({v}))",
+    ("token", "identifier"): "found.append(Token({v}.system, {v}.value))",
+    ("token", "contactpoint"): "found.append(Token({v}.system, {v}.value))",
+    ("token", "boolean"): 'found.append(Token(None, "true" if {v} else "false"))',
+    ("reference", "reference"): "found.extend(reference_values({v}, resource))",
+    ("date", "period"): "found.append(DateRange({v}.start, {v}.end))",
+}
+for _type in ("code", "string", "uri", "id", "canonical", "url", "oid", "uuid"):
+    LEAVES[("token", _type)] = "found.append(Token(None, {v}))"
+    LEAVES[("string", _type)] = "found.append({v})"
+    LEAVES[("uri", _type)] = "found.append({v})"
+for _type in ("canonical", "uri", "url"):
+    LEAVES[("reference", _type)] = "found.append(ReferenceValue(None, {v}))"
+for _type in ("date", "datetime", "instant"):
+    LEAVES[("date", _type)] = "found.append(DateRange({v}, {v}))"
+for _type in ("decimal", "integer", "positiveint", "unsignedint", "integer64"):
+    LEAVES[("number", _type)] = "found.append({v})"
+for _type in ("quantity", "age", "count", "distance", "duration", "simplequantity"):
+    LEAVES[("quantity", _type)] = (
+        "found.append(QuantityValue({v}.value, {v}.system, {v}.code, {v}.unit))"
+    )
+
+# generic converters of the generated module, by search parameter type
+CONVERTERS = {
+    "token": "token_values",
+    "reference": "reference_values",
+    "date": "date_values",
+    "quantity": "quantity_values",
+    "string": "string_values",
+    "number": "number_values",
+    "uri": "uri_values",
+}
+
+
+class Unsupported(Exception):
+    """The expression uses a construct the translator does not handle, it is
+    left to the FHIRPath compiler of the generated package."""
+
+
+class Element(typing.NamedTuple):
+    name: str
+    json_name: str
+    type_name: str
+    is_array: bool
+    is_primitive: bool
+    one_of_many: typing.Optional[str]
+
+
+class Step(typing.NamedTuple):
+    kind: str
+    value: typing.Any
+    narrow: typing.Optional[str] = None
+
+
+def _type_key(type_name: str) -> str:
+    """ """
+    type_name = type_name.lower()
+    return "boolean" if type_name == "bool" else type_name
+
+
+def _branches(node) -> typing.List[typing.Any]:
+    """Splits a union into its operands."""
+    if node[0] == "binary" and node[1] == "|":
+        return _branches(node[2]) + _branches(node[3])
+    return [node]
+
+
+def _steps(node) -> typing.List[Step]:
+    """Flattens a path into its steps: members, ``where`` criteria and
+    type narrowing of the previous member."""
+    kind = node[0]
+    if kind == "member":
+        return [Step("member", node[1])]
+    if kind == "type" and node[1] == "as":
+        return _narrowed(_steps(node[2]), node[3])
+    if kind != "invoke":
+        raise Unsupported(kind)
+    steps = _steps(node[1])
+    invocation = node[2]
+    if invocation[0] == "member":
+        steps.append(Step("member", invocation[1]))
+        return steps
+    if invocation[0] != "function":
+        raise Unsupported(invocation[0])
+    name, arguments = invocation[1], invocation[2]
+    if name in ("ofType", "as"):
+        return _narrowed(steps, fhirpathparser.type_specifier(arguments[0]))
+    if name == "where":
+        steps.append(Step("where", arguments[0]))
+        return steps
+    if (
+        name == "extension"
+        and len(arguments) == 1
+        and arguments[0][0] == "literal"
+        and isinstance(arguments[0][1], str)
+    ):
+        steps.append(Step("member", "extension"))
+        steps.append(Step("url", arguments[0][1]))
+        return steps
+    raise Unsupported(name + "()")
+
+
+def _narrowed(steps: typing.List[Step], type_name: str) -> typing.List[Step]:
+    """Applies a type filter to the last member step."""
+    for position in range(len(steps) - 1, -1, -1):
+        if steps[position].kind == "member":
+            steps[position] = steps[position]._replace(narrow=type_name)
+            return steps
+    raise Unsupported("type filter without member")
+
+
+class ExtractorWriter:
+    """Writes the source of the functions returning the index values of a
+    search parameter, one nested loop per path with the element attributes
+    and cardinalities resolved at generation time."""
+
+    def __init__(self, classes: typing.List[typing.Dict[str, typing.Any]]):
+        self.elements: typing.Dict[str, typing.Dict[str, Element]] = dict()
+        for klass in classes:
+            self.elements[klass["name"]] = dict(
+                [
+                    (element["json_name"], Element(**element))
+                    for element in klass["elements"]
+                ]
+            )
+
+    def resolve(
+        self, class_name: str, name: str, narrow: typing.Optional[str]
+    ) -> typing.List[Element]:
+        """Returns the element(s) of a member, alternatives of a choice of
+        data types are narrowed to the given type."""
+        if class_name in ABSTRACT_TYPES and name not in self.elements[class_name]:
+            # a nested resource, only known at runtime
+            raise Unsupported(f"{class_name}.{name}")
+        if class_name not in self.elements:
+            raise Unsupported(f"{class_name}.{name}")
+        elements = self.elements[class_name]
+        if name in elements:
+            found = [elements[name]]
+        else:
+            found = [e for e in elements.values() if e.one_of_many == name]
+            if not found:
+                raise ValueError(f"{class_name} has no element '{name}'")
+        if narrow is not None:
+            found = [e for e in found if _type_key(e.type_name) == _type_key(narrow)]
+        return found
+
+    def condition(self, node, var: str, class_name: str) -> str:
+        """Returns the Python condition of a ``where`` criteria."""
+        kind = node[0]
+        if kind == "binary" and node[1] in ("and", "or"):
+            return "({0} {1} {2})".format(
+                self.condition(node[2], var, class_name),
+                node[1],
+                self.condition(node[3], var, class_name),
+            )
+        if (
+            kind == "type"
+            and node[1] == "is"
+            and node[2] == ("function", "resolve", ())
+        ):
+            return f"reference_type({var}, resource) == {node[3]!r}"
+        if kind == "binary" and node[1] in ("=", "!="):
+            member, literal = node[2], node[3]
+            if member[0] == "literal":
+                member, literal = literal, member
+            if member[0] == "member" and literal[0] == "literal":
+                elements = self.resolve(class_name, member[1], None)
+                if len(elements) == 1 and not elements[0].is_array:
+                    operator = "==" if node[1] == "=" else "!="
+                    return f"{var}.{elements[0].name} {operator} {literal[1]!r}"
+        raise Unsupported("where criteria")
+
+    def leaf(self, search_type: str, type_name: str, var: str) -> str:
+        """ """
+        statement = LEAVES.get((search_type, _type_key(type_name)))
+        if statement is None:
+            converter = CONVERTERS.get(search_type)
+            if converter is None:
+                statement = "found.append({v})"
+            elif search_type == "reference":
+                statement = "found.extend(reference_values({v}, resource))"
+            else:
+                statement = "found.extend(" + converter + "({v}))"
+        return statement.format(v=var)
+
+    def emit(
+        self,
+        steps: typing.List[Step],
+        position: int,
+        var: str,
+        class_name: str,
+        depth: int,
+        search_type: str,
+        counter: typing.Iterator[int],
+        lines: typing.List[str],
+    ):
+        """Appends the lines visiting the steps from ``position``."""
+        pad = "    " * depth
+        if position == len(steps):
+            lines.append(pad + self.leaf(search_type, class_name, var))
+            return
+        step = steps[position]
+        if step.kind == "where":
+            lines.append(f"{pad}if {self.condition(step.value, var, class_name)}:")
+            self.emit(
+                steps,
+                position + 1,
+                var,
+                class_name,
+                depth + 1,
+                search_type,
+                counter,
+                lines,
+            )
+            return
+        if step.kind == "url":
+            lines.append(f"{pad}if {var}.url == {step.value!r}:")
+            self.emit(
+                steps,
+                position + 1,
+                var,
+                class_name,
+                depth + 1,
+                search_type,
+                counter,
+                lines,
+            )
+            return
+
+        for element in self.resolve(class_name, step.value, step.narrow):
+            value = "v{0}".format(next(counter))
+            lines.append(f"{pad}{value} = {var}.{element.name}")
+            if not element.is_array:
+                lines.append(f"{pad}if {value} is not None:")
+                self.emit(
+                    steps,
+                    position + 1,
+                    value,
+                    element.type_name,
+                    depth + 1,
+                    search_type,
+                    counter,
+                    lines,
+                )
+                continue
+            item = "v{0}".format(next(counter))
+            lines.append(f"{pad}if {value}:")
+            lines.append(f"{pad}    for {item} in {value}:")
+            inner = depth + 2
+            if element.is_primitive:
+                lines.append(f"{pad}        if {item} is not None:")
+                inner += 1
+            self.emit(
+                steps,
+                position + 1,
+                item,
+                element.type_name,
+                inner,
+                search_type,
+                counter,
+                lines,
+            )
+
+    def function(
+        self, name: str, expression: str, resource_type: str, search_type: str
+    ) -> str:
+        """Returns the source of the function extracting the values of an
+        expression from a resource of the given type. Raises Unsupported if
+        the expression cannot be translated, ValueError if it refers to an
+        unknown element."""
+        tree = fhirpathparser.parse(expression)
+        lines = [f"def {name}(resource):", "    found = list()"]
+        counter = itertools.count()
+        branches = _branches(tree)
+        for branch in branches:
+            steps = _steps(branch)
+            first = steps[0]
+            if first.kind == "member" and first.value in self.elements:
+                if first.value not in ABSTRACT_TYPES and first.value != resource_type:
+                    # a path of an other resource type (shared parameters)
+                    continue
+                steps = steps[1:]
+                if first.narrow is not None:
+                    raise Unsupported("type filter on the resource")
+            self.emit(
+                steps, 0, "resource", resource_type, 1, search_type, counter, lines
+            )
+        if len(branches) > 1 and search_type in CONVERTERS:
+            # a union has no duplicates, index values are hashable
+            lines.append("    return list(dict.fromkeys(found))")
+        else:
+            lines.append("    return found")
+        return "\n".join(lines)
+
+
+# element types compared as str, int and bool by the invariant checks
+SCALAR_KINDS = {"bool": "bool", "boolean": "bool"}
+for _type in ("code", "string", "uri", "url", "canonical", "id", "oid", "uuid"):
+    SCALAR_KINDS[_type] = "str"
+SCALAR_KINDS["markdown"] = "str"
+for _type in ("integer", "positiveint", "unsignedint", "integer64", "int"):
+    SCALAR_KINDS[_type] = "int"
+
+COMPARISONS = {"=": "==", "!=": "!=", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+
+
+class Value(typing.NamedTuple):
+    """A translated collection: the source of a single value (which is
+    ``None`` when empty, unless not ``optional``) or of a sequence."""
+
+    source: str
+    type_name: typing.Optional[str]
+    single: bool
+    primitive: typing.Optional[bool]
+    optional: bool = True
+
+
+class Condition(typing.NamedTuple):
+    """A translated boolean expression, ``maybe_empty`` if FHIRPath could
+    give an empty result (``False`` in Python)."""
+
+    source: str
+    maybe_empty: bool
+
+
+class InvariantWriter(ExtractorWriter):
+    """Writes the source of the functions checking the invariants
+    (``ElementDefinition.constraint``) of a class. An invariant holds when
+    its expression is ``true``, so an empty result can be translated to
+    ``False`` as long as it is not negated: ``not()``, ``implies`` and
+    ``xor`` are only translated for operands which are never empty."""
+
+    def __init__(self, classes: typing.List[typing.Dict[str, typing.Any]]):
+        super().__init__(classes)
+        self.counter = itertools.count()
+
+    def variable(self) -> str:
+        return "v{0}".format(next(self.counter))
+
+    def items(self, value: Value) -> str:
+        """Returns the source of the sequence of the values."""
+        if not value.single:
+            return value.source
+        if not value.optional:
+            return f"({value.source},)"
+        return f"(() if {value.source} is None else ({value.source},))"
+
+    def member(self, value: Value, name: str) -> Value:
+        """ """
+        if value.type_name is None or value.primitive:
+            raise Unsupported(name)
+        elements = self.resolve(value.type_name, name, None)
+        if len(elements) > 1:
+            # a choice of data types, at most one is set
+            if not value.single or value.optional:
+                raise Unsupported(f"{name}[x]")
+            names = [f"{value.source}.{element.name}" for element in elements]
+            source = names[-1]
+            for attribute in reversed(names[:-1]):
+                source = f"{attribute} if {attribute} is not None else {source}"
+            types = set([_type_key(element.type_name) for element in elements])
+            primitives = set([element.is_primitive for element in elements])
+            return Value(
+                f"({source})",
+                elements[0].type_name if len(types) == 1 else None,
+                True,
+                primitives.pop() if len(primitives) == 1 else None,
+            )
+        element = elements[0]
+        attribute = element.name
+        if value.single and not value.optional:
+            if not element.is_array:
+                return Value(
+                    f"{value.source}.{attribute}",
+                    element.type_name,
+                    True,
+                    element.is_primitive,
+                )
+            if not element.is_primitive:
+                return Value(
+                    f"({value.source}.{attribute} or ())",
+                    element.type_name,
+                    False,
+                    False,
+                )
+            item = self.variable()
+            return Value(
+                f"[{item} for {item} in {value.source}.{attribute} or () "
+                f"if {item} is not None]",
+                element.type_name,
+                False,
+                True,
+            )
+        parent, item = self.variable(), self.variable()
+        if not element.is_array:
+            source = (
+                f"[{parent}.{attribute} for {parent} in {self.items(value)} "
+                f"if {parent}.{attribute} is not None]"
+            )
+        else:
+            source = (
+                f"[{item} for {parent} in {self.items(value)} "
+                f"for {item} in {parent}.{attribute} or ()"
+            )
+            source += f" if {item} is not None]" if element.is_primitive else "]"
+        return Value(source, element.type_name, False, element.is_primitive)
+
+    def collection(self, node, var: str, type_name: str) -> Value:
+        """Translates a path (members and ``where``) evaluated on ``var``."""
+        kind = node[0]
+        if kind == "this":
+            return Value(var, type_name, True, type_name not in self.elements, False)
+        if kind == "member":
+            return self.member(self.collection(("this",), var, type_name), node[1])
+        if kind == "function":
+            node = ("invoke", ("this",), node)
+        if node[0] != "invoke":
+            raise Unsupported(kind)
+        source = self.collection(node[1], var, type_name)
+        invocation = node[2]
+        if invocation[0] == "member":
+            return self.member(source, invocation[1])
+        if invocation[0] == "function" and invocation[1] == "where":
+            if len(invocation[2]) != 1:
+                raise Unsupported("where()")
+            item = self.variable()
+            criteria = self.condition(invocation[2][0], item, source.type_name)
+            return Value(
+                f"[{item} for {item} in {self.items(source)} if {criteria.source}]",
+                source.type_name,
+                False,
+                source.primitive,
+            )
+        raise Unsupported(str(invocation[1]))
+
+    def exists(self, value: Value) -> str:
+        """ """
+        if not value.single:
+            return f"bool({value.source})"
+        if not value.optional:
+            return "True"
+        return f"({value.source} is not None)"
+
+    def count(self, node, var: str, type_name: str) -> str:
+        """ """
+        if node in (
+            ("function", "children", ()),
+            ("invoke", ("this",), ("function", "children", ())),
+        ):
+            if type_name not in self.elements:
+                raise Unsupported("children()")
+            terms = list()
+            for element in self.elements[type_name].values():
+                attribute = f"{var}.{element.name}"
+                if not element.is_array:
+                    terms.append(f"({attribute} is not None)")
+                elif not element.is_primitive:
+                    terms.append(f"len({attribute} or ())")
+                else:
+                    item = self.variable()
+                    terms.append(
+                        f"len([{item} for {item} in {attribute} or () "
+                        f"if {item} is not None])"
+                    )
+            return "({0})".format(" + ".join(terms) or "0")
+        value = self.collection(node, var, type_name)
+        if not value.single:
+            return f"len({value.source})"
+        if not value.optional:
+            return "1"
+        return f"(0 if {value.source} is None else 1)"
+
+    def scalar(self, node, var: str, type_name: str) -> typing.Tuple[str, str, bool]:
+        """Translates an operand of a comparison, returns its source, kind
+        (``str``, ``int`` or ``bool``) and whether it could be ``None``."""
+        if node[0] == "literal":
+            if isinstance(node[1], bool):
+                return repr(node[1]), "bool", False
+            if isinstance(node[1], (str, int)):
+                return repr(node[1]), type(node[1]).__name__, False
+            raise Unsupported("literal")
+        if node[0] == "function":
+            node = ("invoke", ("this",), node)
+        if node[0] == "invoke" and node[2] == ("function", "count", ()):
+            return self.count(node[1], var, type_name), "int", False
+        try:
+            value = self.collection(node, var, type_name)
+        except Unsupported:
+            condition = self.condition(node, var, type_name)
+            if condition.maybe_empty:
+                raise
+            return condition.source, "bool", False
+        kind = SCALAR_KINDS.get(_type_key(value.type_name or ""))
+        if not value.single or not value.primitive or kind is None:
+            raise Unsupported("comparison")
+        return value.source, kind, value.optional
+
+    def comparison(self, node, var: str, type_name: str) -> Condition:
+        """ """
+        operator = node[1]
+        left = self.scalar(node[2], var, type_name)
+        right = self.scalar(node[3], var, type_name)
+        if left[1] != right[1]:
+            raise Unsupported("comparison of different types")
+        compared = f"{left[0]} {COMPARISONS[operator]} {right[0]}"
+        guards = [
+            f"{source} is not None" for source, _, optional in (left, right) if optional
+        ]
+        if operator == "=" or not guards:
+            # None never equals a value
+            return Condition(f"({compared})", bool(guards))
+        return Condition("({0} and {1})".format(" and ".join(guards), compared), True)
+
+    def condition(self, node, var: str, type_name: str) -> Condition:
+        """Translates a boolean expression evaluated on ``var``."""
+        kind = node[0]
+        if kind == "literal" and isinstance(node[1], bool):
+            return Condition(repr(node[1]), False)
+        if kind == "binary" and node[1] in ("and", "or"):
+            left = self.condition(node[2], var, type_name)
+            right = self.condition(node[3], var, type_name)
+            neutral = "True" if node[1] == "and" else "False"
+            if left.source == neutral:
+                return right
+            if right.source == neutral:
+                return left
+            return Condition(
+                f"({left.source} {node[1]} {right.source})",
+                left.maybe_empty or right.maybe_empty,
+            )
+        if kind == "binary" and node[1] in ("implies", "xor"):
+            left = self.condition(node[2], var, type_name)
+            right = self.condition(node[3], var, type_name)
+            if left.maybe_empty or (node[1] == "xor" and right.maybe_empty):
+                raise Unsupported(node[1])
+            if node[1] == "xor":
+                return Condition(f"({left.source} != {right.source})", False)
+            return Condition(
+                f"(not {left.source} or {right.source})", right.maybe_empty
+            )
+        if kind == "binary" and node[1] in COMPARISONS:
+            return self.comparison(node, var, type_name)
+        if kind == "function":
+            node = ("invoke", ("this",), node)
+        if node[0] == "invoke" and node[2][0] == "function":
+            name, arguments = node[2][1], node[2][2]
+            if name == "not" and not arguments:
+                operand = self.condition(node[1], var, type_name)
+                if operand.maybe_empty:
+                    raise Unsupported("not()")
+                return Condition(f"(not {operand.source})", False)
+            if name in ("exists", "empty", "hasValue", "all") and len(arguments) <= (
+                1 if name in ("exists", "all") else 0
+            ):
+                return self.test(name, arguments, node[1], var, type_name)
+        value = self.collection(node, var, type_name)
+        if value.single and _type_key(value.type_name or "") == "boolean":
+            # a boolean element
+            return Condition(f"({value.source} is True)", value.optional)
+        raise Unsupported("condition")
+
+    def test(self, name: str, arguments, node, var: str, type_name: str) -> Condition:
+        """``exists()``, ``empty()``, ``hasValue()`` and ``all()`` of a path."""
+        value = self.collection(node, var, type_name)
+        if arguments:
+            item = self.variable()
+            criteria = self.condition(arguments[0], item, value.type_name)
+            function = "any" if name == "exists" else "all"
+            return Condition(
+                f"{function}({criteria.source} for {item} in {self.items(value)})",
+                False,
+            )
+        if name == "all":
+            return Condition("True", False)
+        if name == "hasValue":
+            if value.primitive is None:
+                raise Unsupported("hasValue()")
+            if not value.primitive:
+                return Condition("False", False)
+            if not value.single:
+                return Condition(f"(len({value.source}) == 1)", False)
+        if name == "exists" or name == "hasValue":
+            return Condition(self.exists(value), False)
+        if not value.single:
+            return Condition(f"(not {value.source})", False)
+        if not value.optional:
+            return Condition("False", False)
+        return Condition(f"({value.source} is None)", False)
+
+    def invariant(self, expression: str, class_name: str) -> str:
+        """Returns the Python condition of an invariant of a class. Raises
+        Unsupported if the expression cannot be translated, ValueError if it
+        is not valid or refers to an unknown element."""
+        tree = fhirpathparser.parse(expression)
+        return self.condition(tree, "value", class_name).source
+
+    def checks(self, name: str, tests: typing.List[typing.Tuple[str, str]]) -> str:
+        """Returns the source of the function checking the invariants of a
+        class, ``tests`` gives the key and the condition of each. The
+        function returns the keys of the failing invariants."""
+        lines = [f"def {name}(value, resource):", "    failed = list()"]
+        for key, test in tests:
+            lines.append(f"    if not {test}:")
+            lines.append(f"        failed.append({json.dumps(key)})")
+        lines.append("    return failed")
+        return "\n".join(lines)
@@ -3,17 +3,20 @@
 
 import io
 import json
-import os
+import pathlib
+import re
 import shutil
 from textwrap import TextWrapper
 
-from fhirspec import FHIRClass
-from fhirspec import FHIR_CLASS_TYPES
-from jinja2 import Environment, PackageLoader, TemplateNotFound
+from jinja2 import Environment, PackageLoader, TemplateNotFound, meta
 from jinja2.filters import pass_context
 from markupsafe import Markup
 
+import fhiranalysis
+import fhiremitter
+import fhirpathcodegen
 from logger import logger
+from valuesetexpansion import ValueSetExpander, required_bindings
 
 
 @pass_context
@@ -57,12 +60,80 @@ def include_file(file_location):
         return fp.read()
 
 
+def element_tables(analysis):
+    """Returns the elements of every resource and complex type class (own and
+    inherited, in the specification's sequence order) as ``{"name": class
+    name, "elements": [...]}``, sorted by class name."""
+    classes = list()
+    for klass in analysis.classes:
+        properties = dict(
+            [
+                (prop.orig_name, prop)
+                for prop in analysis.expanded_properties(klass.name)
+            ]
+        )
+        sequence = [
+            name for name in klass.expanded_properties_sequence if name in properties
+        ]
+        # anything not part of the sequence goes last
+        sequence.extend(
+            sorted([name for name in properties if name not in sequence])
+        )
+        elements = list()
+        for name in sequence:
+            prop = properties[name]
+            elements.append(
+                {
+                    "name": prop.name,
+                    "json_name": prop.orig_name,
+                    "type_name": prop.class_name,
+                    "is_array": prop.is_array,
+                    "is_primitive": prop.is_primitive,
+                    "one_of_many": prop.one_of_many,
+                }
+            )
+        classes.append({"name": klass.name, "elements": elements})
+    return classes
+
+
+def packed_lines(values, width=76):
+    """Returns the Python string literals (to be concatenated) of the values
+    joined by newlines, each literal about ``width`` characters long."""
+    literals = list()
+    line = list()
+    for position, value in enumerate(values):
+        line.append(value if position == len(values) - 1 else value + "\n")
+        if len(json.dumps("".join(line), ensure_ascii=False)) >= width:
+            literals.append(json.dumps("".join(line), ensure_ascii=False))
+            line = list()
+    if line or not literals:
+        literals.append(json.dumps("".join(line), ensure_ascii=False))
+    return literals
+
+
+def usable_tests(collection, release_name):
+    """Returns the unit test cases of a collection whose example file
+    validates, the ones used by the unit tests and by the benchmarks."""
+    tests = collection.tests
+    if release_name in ("R4", "R4B") and collection.klass.name == "Bundle":
+        tests = [
+            t
+            for t in tests
+            if t.filename not in ("profiles-types.json", "extension-definitions.json")
+        ]
+    return tests
+
+
 class FHIRRenderer(object):
     """Superclass for all renderer implementations."""
 
-    def __init__(self, spec, settings):
+    def __init__(self, spec, settings, analysis=None):
         self.spec = spec
         self.settings = settings
+        self.analysis = analysis
+        # files read by the renderer (templates, copied files), the watch mode
+        # renders again when one of them changes
+        self.sources = set()
         self.jinjaenv = Environment(
             loader=PackageLoader("generate", self.settings.TEMPLATE_DIRECTORY)
         )
@@ -76,6 +147,13 @@ class FHIRRenderer(object):
             module_path += "." + self.settings.CURRENT_RELEASE_NAME
         return module_path
 
+    def get_analysis(self) -> fhiranalysis.ReleaseIR:
+        """Returns the analysis of the specification the renderers share,
+        computed here if none was given."""
+        if self.analysis is None:
+            self.analysis = fhiranalysis.analyze(self.spec, self.settings)
+        return self.analysis
+
     def render(self):
         """The main rendering starting point for subclasses to override."""
         raise Exception("Cannot use abstract superclass' `render` method")
@@ -87,6 +165,13 @@ class FHIRRenderer(object):
         :param template_name: The Jinja2 template to render, located in settings.TEMPLATE_DIRECTORY
         :param target_path: Output path
         """
+        rendered = self.render_template(data, template_name)
+        if rendered is not None:
+            self.write_file(rendered, target_path)
+
+    def render_template(self, data, template_name):
+        """Render the given data using a Jinja2 template, returns the output
+        (None if the template is not found)."""
         try:
             template = self.jinjaenv.get_template(template_name)
         except TemplateNotFound as e:
@@ -95,20 +180,45 @@ class FHIRRenderer(object):
                     template_name, self.settings.TEMPLATE_DIRECTORY
                 )
             )
-            return
+            return None
 
+        if pathlib.Path(template.filename) not in self.sources:
+            self.add_template_sources(template_name)
+        # added global variables
+        data.update({"root_module_path": self.get_root_module_path()})
+        return template.render(data)
+
+    def add_template_sources(self, template_name):
+        """Adds the file of a template and of the templates it includes,
+        imports or extends to ``sources``."""
+        pending, seen = [template_name], set()
+        while pending:
+            name = pending.pop()
+            if name in seen:
+                continue
+            seen.add(name)
+            source, filename, _ = self.jinjaenv.loader.get_source(self.jinjaenv, name)
+            self.sources.add(pathlib.Path(filename))
+            pending.extend(
+                [
+                    referenced
+                    for referenced in meta.find_referenced_templates(
+                        self.jinjaenv.parse(source)
+                    )
+                    if referenced is not None
+                ]
+            )
+
+    def write_file(self, rendered, target_path):
+        """Write rendered output to the file at the target path."""
         if not target_path:
             raise Exception("No target filepath provided")
         dirpath = target_path.parent
         if not dirpath.exists():
             dirpath.mkdir(parents=True)
 
-        # added global variables
-        data.update({"root_module_path": self.get_root_module_path()})
-
         with io.open(target_path, "w", encoding="utf-8") as handle:
             logger.info("Writing {}".format(target_path))
-            rendered = template.render(data)
             handle.write(rendered)
             # handle.write(rendered.encode('utf-8'))
 
@@ -129,56 +239,59 @@ class FHIRStructureDefinitionRenderer(FHIRRenderer):
                     "Copying manual profiles in {0} to {1}".format(filepath.name, tgt)
                 )
                 shutil.copyfile(filepath, tgt)
+                self.sources.add(filepath)
 
     def render_validators(self):
         """ """
-        for profile in self.spec.writable_profiles():
-            profile.writable_classes()
-        all_classes = [
-            cls
-            for cls in FHIRClass.__known_classes__.values()
-            if cls.class_type
-            in (
-                FHIR_CLASS_TYPES.resource,
-                FHIR_CLASS_TYPES.complex_type,
-                FHIR_CLASS_TYPES.logical,
-            )
-        ]
-        all_classes = sorted(all_classes, key=lambda x: x.name)
         target_path = self.settings.RESOURCE_TARGET_DIRECTORY / "fhirtypesvalidators.py"
         self.do_render(
-            {"classes": all_classes}, "fhirtypesvalidators.jinja2", target_path
+            {"classes": self.get_analysis().classes},
+            "fhirtypesvalidators.jinja2",
+            target_path,
         )
 
     def render_fhir_types(self):
         """ """
-        for profile in self.spec.writable_profiles():
-            profile.writable_classes()
-        all_classes = [
-            cls
-            for cls in FHIRClass.__known_classes__.values()
-            if cls.class_type
-            in (
-                FHIR_CLASS_TYPES.resource,
-                FHIR_CLASS_TYPES.complex_type,
-                FHIR_CLASS_TYPES.logical,
-            )
-        ]
-        all_classes = sorted(all_classes, key=lambda x: x.name)
         target_path = self.settings.RESOURCE_TARGET_DIRECTORY / "fhirtypes.py"
         self.do_render(
             {
-                "classes": all_classes,
+                "classes": self.get_analysis().classes,
                 "release_name": self.spec.settings.CURRENT_RELEASE_NAME,
+                "lazy_primitives": getattr(self.settings, "LAZY_PRIMITIVES", False),
             },
             "fhirtypes.jinja2",
             target_path,
         )
 
+    def resource_data(self, profile):
+        """Returns the data of the resource module of a profile."""
+        return {
+            "profile": profile,
+            "release_name": self.spec.settings.CURRENT_RELEASE_NAME,
+            "info": self.spec.info,
+            "imports": profile.imports,
+            "classes": profile.classes,
+            "need_fhirtypes": profile.need_fhirtypes,
+            "has_array_type": profile.has_array_type,
+            "has_one_of_many": profile.has_one_of_many,
+            "need_union_type": profile.need_union_type,
+            "need_pydantic_field": profile.need_pydantic_field,
+            "need_typing": profile.need_typing,
+            "need_root_validator": profile.need_root_validator,
+            "has_required_primitive_element": profile.has_required_primitive_element,
+        }
+
+    def render_resource(self, data, backend=None):
+        """Returns the source of a resource module, rendered by the Jinja
+        template or written by the code emitter (``RESOURCE_BACKEND``)."""
+        backend = backend or getattr(self.settings, "RESOURCE_BACKEND", "jinja")
+        if backend == "emitter":
+            return fhiremitter.emit_resource_module(data)
+        return self.render_template(data, self.settings.RESOURCE_SOURCE_TEMPLATE)
+
     def render(self):
-        for profile in self.spec.writable_profiles():
-            classes = sorted(profile.writable_classes(), key=lambda x: x.name)
-            if 0 == len(classes):
+        for profile in self.get_analysis().profiles:
+            if 0 == len(profile.classes):
                 if (
                     profile.url is not None
                 ):  # manual profiles have no url and usually write no classes
@@ -189,153 +302,16 @@ class FHIRStructureDefinitionRenderer(FHIRRenderer):
                     )
                 continue
 
-            imports = profile.needed_external_classes()
-            need_fhirtypes: bool = False
-            has_one_of_many = False
-            has_array_type = False
-            has_required_primitive_element = False
-            need_union_type = False
-            need_typing = False
-            need_root_validator = False
-            need_pydantic_field = False
-            one_of_many_fields = dict()
-            required_primitive_element_fields = dict()
-            for klass in classes:
-                for prop in klass.properties:
-                    if need_pydantic_field is False:
-                        need_pydantic_field = True
-                    # special variable
-                    prop.need_primitive_ext = False
-                    if (
-                        klass.name in ("Resource",)
-                        and self.settings.CURRENT_RELEASE_NAME == "R4"
-                        and prop.class_name == "String"
-                        and prop.name == "id"
-                    ):
-                        # we force Resource.id type = Id
-                        prop.class_name = "Id"
-                        prop.field_type = "Id"
-                        prop.type_name = "id"
-
-                    # Issue https://github.com/nazrulworld/fhir.resources/pull/160
-                    if (
-                        klass.name in ("Element",)
-                        and self.settings.CURRENT_RELEASE_NAME == "R4B"
-                        and prop.class_name == "Id"
-                        and prop.name == "id"
-                    ):
-                        prop.class_name = "String"
-                        prop.field_type = "String"
-
-                    if not prop.is_native and need_fhirtypes is False:
-                        need_fhirtypes = True
-                    if prop.is_array and has_array_type is False:
-                        has_array_type = True
-
-                    prop_klass = FHIRClass.with_name(prop.class_name)
-                    if prop_klass.class_type in (
-                        FHIR_CLASS_TYPES.resource,
-                        FHIR_CLASS_TYPES.logical,
-                        FHIR_CLASS_TYPES.complex_type,
-                    ):
-                        prop.field_type = prop.class_name + "Type"
-                    elif (
-                        prop_klass.class_type == FHIR_CLASS_TYPES.primitive_type
-                        or prop.is_native
-                    ) and prop.name != "id":
-                        prop.need_primitive_ext = True
-
-                    if prop_klass.class_type != FHIR_CLASS_TYPES.other:
-                        prop.field_type_module = "fhirtypes"
-
-                    # Check for Union Type
-                    if (
-                        prop.need_primitive_ext is True
-                        and prop.is_array
-                        and need_union_type is False
-                    ):
-                        need_union_type = True
-                    # check for one_of_many
-                    if prop.one_of_many:
-                        if not has_one_of_many:
-                            has_one_of_many = True
-                        if klass.name not in one_of_many_fields:
-                            one_of_many_fields[klass.name] = {prop.one_of_many: []}
-                        if prop.one_of_many not in one_of_many_fields[klass.name]:
-                            one_of_many_fields[klass.name][prop.one_of_many] = []
-                        one_of_many_fields[klass.name][prop.one_of_many].append(
-                            prop.name
-                        )
-                    # Check Enums
-                    if prop.field_type == "Code" and prop.short and "|" in prop.short:
-                        prop.enum = enum_list = list()
-                        for item in map(lambda x: x.strip(), prop.short.split("|")):
-                            parts = item.split(" ")
-                            enum_list.append(parts[0])
-                            if len(parts) == 2 and parts[1] == "+":
-                                enum_list.append(parts[1])
-                    else:
-                        prop.enum = list()
-                    # check non-optional primitive element
-                    if (
-                        prop.need_primitive_ext
-                        and prop.nonoptional
-                        and not prop.one_of_many
-                    ):
-                        if has_required_primitive_element is False:
-                            has_required_primitive_element = True
-                        if klass.name not in required_primitive_element_fields:
-                            required_primitive_element_fields[klass.name] = []
-                        if klass.name == "Extension":
-                            required_primitive_element_fields[klass.name].append(
-                                (prop.orig_name, None)
-                            )
-                        else:
-                            required_primitive_element_fields[klass.name].append(
-                                (prop.orig_name, prop.orig_name + "__ext")
-                            )
-
-                    # Fix Primitives Types
-                    if prop_klass.class_type == FHIR_CLASS_TYPES.primitive_type:
-                        if not prop.field_type.endswith("Type"):
-                            prop.field_type += "Type"
-
-            if has_one_of_many or has_required_primitive_element:
-                need_root_validator = True
-
-            if (
-                has_one_of_many
-                or has_required_primitive_element
-                or has_array_type
-            ):
-                need_typing = True
-            data = {
-                "profile": profile,
-                "release_name": self.spec.settings.CURRENT_RELEASE_NAME,
-                "info": self.spec.info,
-                "imports": imports,
-                "classes": classes,
-                "need_fhirtypes": need_fhirtypes,
-                "has_array_type": has_array_type,
-                "fhir_class_types": FHIR_CLASS_TYPES,
-                "one_of_many_fields": one_of_many_fields,
-                "has_one_of_many": has_one_of_many,
-                "need_union_type": need_union_type,
-                "need_pydantic_field": need_pydantic_field,
-                "need_typing": need_typing,
-                "need_root_validator": need_root_validator,
-                "required_primitive_element_fields": required_primitive_element_fields,
-                "has_required_primitive_element": has_required_primitive_element,
-            }
             ptrn = (
                 profile.targetname.lower()
                 if self.settings.RESOURCE_MODULE_LOWERCASE
                 else profile.targetname
             )
-            source_path = self.settings.RESOURCE_SOURCE_TEMPLATE
             target_name = self.settings.RESOURCE_FILE_NAME_PATTERN.format(ptrn)
             target_path = self.settings.RESOURCE_TARGET_DIRECTORY / target_name
-            self.do_render(data, source_path, target_path)
+            rendered = self.render_resource(self.resource_data(profile))
+            if rendered is not None:
+                self.write_file(rendered, target_path)
 
         self.copy_files(target_path.parent)
         # self.render_validators()
@@ -353,12 +329,12 @@ class FHIRDependencyRenderer(FHIRRenderer):
     def render(self):
         data = {"info": self.spec.info}
         resources = []
-        for profile in self.spec.writable_profiles():
+        for profile in self.get_analysis().profiles:
             resources.append(
                 {
                     "name": profile.targetname,
-                    "imports": profile.needed_external_classes(),
-                    "references": profile.referenced_classes(),
+                    "imports": profile.imports,
+                    "references": profile.references,
                 }
             )
         data["resources"] = sorted(resources, key=lambda x: x["name"])
@@ -369,8 +345,423 @@ class FHIRDependencyRenderer(FHIRRenderer):
         )
 
 
+class FHIRReferenceIndexRenderer(FHIRRenderer):
+    """Puts down, per class, the elements that can lead to a ``Reference``:
+    the reference elements themselves (with their allowed target types),
+    the backbone/data type elements that contain references further down
+    and the elements holding nested resources (i.e. ``contained``,
+    ``Bundle.entry.resource``). Classes that can never contain a reference
+    are left out, so an extractor following the index only visits
+    reference-bearing paths.
+    """
+
+    def render(self):
+        reference_name = self.settings.REPLACE_MAP.get("Reference", "Reference")
+        analysis = self.get_analysis()
+        resource_names = set(
+            [
+                profile.targetname
+                for profile in analysis.profiles
+                if profile.kind == "resource"
+            ]
+        )
+        candidates = dict()
+        for klass in analysis.classes:
+            if klass.name == "Extension":
+                # extension content is open-ended, never followed
+                continue
+            candidates[klass.name] = analysis.expanded_properties(klass.name)
+
+        # classes reaching a reference, directly or through other classes
+        reaching = set()
+        changed = True
+        while changed:
+            changed = False
+            for name, properties in candidates.items():
+                if name in reaching:
+                    continue
+                for prop in properties:
+                    if (
+                        prop.class_name == reference_name
+                        or prop.class_name in resource_names
+                        or prop.class_name in reaching
+                    ):
+                        reaching.add(name)
+                        changed = True
+                        break
+
+        classes = list()
+        for name in sorted(reaching):
+            entries = list()
+            for prop in candidates[name]:
+                if prop.class_name == reference_name:
+                    kind = "REFERENCE"
+                elif prop.class_name in resource_names:
+                    kind = "RESOURCE"
+                elif prop.class_name in reaching:
+                    kind = "ELEMENT"
+                else:
+                    continue
+                entries.append(
+                    {
+                        "name": prop.name,
+                        "json_name": prop.orig_name,
+                        "kind": kind,
+                        "class_name": prop.class_name,
+                        "is_array": prop.is_array,
+                        "targets": sorted(set(prop.reference_to_names)),
+                    }
+                )
+            classes.append({"name": name, "entries": entries})
+
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "classes": classes,
+        }
+        target_path = (
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.REFERENCE_INDEX_TARGET_NAME
+        )
+        self.do_render(
+            data, self.settings.REFERENCE_INDEX_SOURCE_TEMPLATE, target_path
+        )
+
+
+class FHIRElementTableRenderer(FHIRRenderer):
+    """Write the element table of every class: element name, JSON name, type,
+    cardinality and primitive flag in the specification's sequence order,
+    together with the modules built on them: the path accessor compiler, the
+    columnar flattening views, the streaming XML parser/serializer, the
+    canonical JSON serializer, the FHIRPath expression compiler, the
+    lightweight read-only models, the string interning of low-cardinality
+    values and the zero-copy handling of large base64 payloads.
+    """
+
+    def render(self):
+        analysis = self.get_analysis()
+        resource_names = set(
+            [
+                profile.targetname
+                for profile in analysis.profiles
+                if profile.kind == "resource"
+            ]
+        )
+        classes = element_tables(analysis)
+
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "classes": classes,
+            "resource_names": sorted(resource_names),
+            "intern_types": getattr(self.settings, "INTERN_TYPES", []),
+            "intern_excluded": getattr(self.settings, "INTERN_EXCLUDED", []),
+            "payload_names": sorted(
+                set(
+                    [
+                        elem["json_name"]
+                        for klass in classes
+                        for elem in klass["elements"]
+                        if elem["type_name"] == "Base64Binary"
+                    ]
+                )
+            ),
+            "payload_threshold": getattr(self.settings, "PAYLOAD_THRESHOLD", 65536),
+            "payload_spill_threshold": getattr(
+                self.settings, "PAYLOAD_SPILL_THRESHOLD", None
+            ),
+        }
+        self.do_render(
+            data,
+            self.settings.ELEMENT_TABLE_SOURCE_TEMPLATE,
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.ELEMENT_TABLE_TARGET_NAME,
+        )
+        self.do_render(
+            data,
+            self.settings.ACCESSORS_SOURCE_TEMPLATE,
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.ACCESSORS_TARGET_NAME,
+        )
+        for template, target_name in (
+            ("VIEWS_SOURCE_TEMPLATE", "VIEWS_TARGET_NAME"),
+            ("XML_SOURCE_TEMPLATE", "XML_TARGET_NAME"),
+            ("CANONICAL_SOURCE_TEMPLATE", "CANONICAL_TARGET_NAME"),
+            ("FHIRPATH_SOURCE_TEMPLATE", "FHIRPATH_TARGET_NAME"),
+            ("LITE_SOURCE_TEMPLATE", "LITE_TARGET_NAME"),
+            ("INTERN_SOURCE_TEMPLATE", "INTERN_TARGET_NAME"),
+            ("PAYLOAD_SOURCE_TEMPLATE", "PAYLOAD_TARGET_NAME"),
+        ):
+            if getattr(self.settings, template, None):
+                self.do_render(
+                    data,
+                    getattr(self.settings, template),
+                    self.settings.RESOURCE_TARGET_DIRECTORY
+                    / getattr(self.settings, target_name),
+                )
+
+
+class FHIRSearchParameterRenderer(FHIRRenderer):
+    """Write the search parameter extractors: the FHIRPath expression of every
+    search parameter is translated into a Python function per base resource
+    type (see ``fhirpathcodegen``), expressions which cannot be translated are
+    left to the generated FHIRPath compiler.
+    """
+
+    def render(self):
+        filename = getattr(
+            self.settings, "SEARCH_PARAMETERS_FILE_NAME", "search-parameters.json"
+        )
+        writer = fhirpathcodegen.ExtractorWriter(element_tables(self.get_analysis()))
+        resources = dict()
+        functions = list()
+        translated = 0
+        for definition in self.spec.read_bundle_resources(filename):
+            expression = definition.get("expression")
+            if definition.get("resourceType") != "SearchParameter" or not expression:
+                continue
+            code, search_type = definition["code"], definition["type"]
+            for resource_type in definition.get("base", []):
+                if resource_type not in writer.elements:
+                    continue
+                name = "_{0}_{1}".format(
+                    resource_type.lower(), re.sub(r"\W", "_", code.lstrip("_"))
+                )
+                try:
+                    functions.append(
+                        writer.function(name, expression, resource_type, search_type)
+                    )
+                    translated += 1
+                except fhirpathcodegen.Unsupported:
+                    functions.append(
+                        "{0} = compiled({1}, {2}, {3})".format(
+                            name,
+                            json.dumps(expression),
+                            json.dumps(resource_type),
+                            json.dumps(search_type),
+                        )
+                    )
+                except ValueError as exc:
+                    logger.warning(
+                        "Search parameter {0} of {1} is skipped: {2}".format(
+                            code, resource_type, exc
+                        )
+                    )
+                    continue
+                resources.setdefault(resource_type, list()).append(
+                    {
+                        "code": code,
+                        "type": search_type,
+                        "expression": json.dumps(expression),
+                        "extractor": name,
+                    }
+                )
+        logger.info(
+            "{0} of {1} search parameter extractors are translated".format(
+                translated, len(functions)
+            )
+        )
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "functions": functions,
+            "resources": [
+                {"name": name, "parameters": resources[name]}
+                for name in sorted(resources)
+            ],
+        }
+        self.do_render(
+            data,
+            self.settings.SEARCH_PARAMETERS_SOURCE_TEMPLATE,
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.SEARCH_PARAMETERS_TARGET_NAME,
+        )
+
+
+class FHIRInvariantRenderer(FHIRRenderer):
+    """Write the invariant checkers: the constraints of the element
+    definitions (``ele-1``, ``dom-2``, ...) are translated into one Python
+    function per class, with the inherited ones (see ``fhirpathcodegen``).
+    A constraint of an element which is not a class is checked on every
+    value of that element by the class owning it.
+    """
+
+    def render(self):
+        analysis = self.get_analysis()
+        classes = element_tables(analysis)
+        writer = fhirpathcodegen.InvariantWriter(classes)
+        known = set([klass["name"] for klass in classes])
+        class_paths = dict([(klass.path, klass.name) for klass in analysis.classes])
+        invariants = dict()
+        owned = dict()
+        for profile in self.spec.writable_profiles():
+            for element in profile.structure.differential:
+                path = element["path"]
+                for constraint in element.get("constraint", []):
+                    key, expression = constraint["key"], constraint.get("expression")
+                    if not expression:
+                        continue
+                    if path in class_paths:
+                        class_name = class_paths[path]
+                    elif path.rsplit(".", 1)[0] in class_paths:
+                        class_name = class_paths[path.rsplit(".", 1)[0]]
+                        member = path.rsplit(".", 1)[1].replace("[x]", "")
+                        expression = "{0}.all({1})".format(member, expression)
+                    else:
+                        continue
+                    # keys redeclared at other paths (i.e ``cnl-0`` on every
+                    # canonical resource) are checked there too, the table
+                    # keeps the first definition
+                    if key not in invariants:
+                        invariants[key] = {
+                            "key": key,
+                            "severity": json.dumps(constraint.get("severity", "error")),
+                            "human": json.dumps(constraint.get("human", "")),
+                            "expression": json.dumps(constraint["expression"]),
+                            "path": path,
+                        }
+                    elif invariants[key]["expression"] != json.dumps(
+                        constraint["expression"]
+                    ):
+                        logger.warning(
+                            "Invariant {0} of {1} differs from the one of {2}, "
+                            "its violations are reported with the latter".format(
+                                key, path, invariants[key]["path"]
+                            )
+                        )
+                    owned.setdefault(class_name, list()).append((key, expression))
+
+        functions = list()
+        checks = list()
+        translated = total = 0
+        for class_name in sorted(known):
+            inherited = list()
+            for klass in analysis.chain(class_name):
+                for key, expression in owned.get(klass.name, []):
+                    if key not in [found for found, _ in inherited]:
+                        inherited.append((key, expression))
+            if not inherited:
+                continue
+            name = "_" + class_name.lower()
+            tests = list()
+            for key, expression in inherited:
+                total += 1
+                try:
+                    tests.append((key, writer.invariant(expression, class_name)))
+                    translated += 1
+                except fhirpathcodegen.Unsupported:
+                    fallback = "{0}_{1}".format(name, re.sub(r"\W", "_", key))
+                    functions.append(
+                        "{0} = compiled({1}, {2}, {3})".format(
+                            fallback,
+                            json.dumps(expression),
+                            json.dumps(class_name),
+                            json.dumps(key),
+                        )
+                    )
+                    tests.append((key, "{0}(value, resource)".format(fallback)))
+                except ValueError as exc:
+                    logger.warning(
+                        "Invariant {0} of {1} is skipped: {2}".format(
+                            key, class_name, exc
+                        )
+                    )
+            functions.append(writer.checks(name, tests))
+            checks.append({"name": class_name, "function": name})
+        logger.info(
+            "{0} of {1} invariant checks are translated".format(translated, total)
+        )
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "invariants": [invariants[key] for key in sorted(invariants)],
+            "functions": functions,
+            "checks": checks,
+        }
+        self.do_render(
+            data,
+            self.settings.INVARIANTS_SOURCE_TEMPLATE,
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.INVARIANTS_TARGET_NAME,
+        )
+
+
+class FHIRBindingRenderer(FHIRRenderer):
+    """Write the expansions of the value sets of the required bindings, per
+    class and element (inherited ones included): the value sets are expanded
+    at generation time (see ``valuesetexpansion``), those which cannot be
+    (external code systems, unsupported filters) are left out.
+    """
+
+    coded_types = ("Code", "Coding", "CodeableConcept")
+
+    def render(self):
+        analysis = self.get_analysis()
+        classes = element_tables(analysis)
+        known = dict([(klass["name"], klass["elements"]) for klass in classes])
+        class_paths = dict([(klass.path, klass.name) for klass in analysis.classes])
+        expander = ValueSetExpander(self.spec)
+        expansions = dict()
+        owned = dict()
+        bound = expanded = 0
+        for path, url in sorted(required_bindings(self.spec).items()):
+            parent, member = path.rsplit(".", 1) if "." in path else (path, "")
+            class_name = class_paths.get(parent)
+            if class_name is None:
+                continue
+            bound += 1
+            codes = expander.expand(url)
+            if codes is None:
+                continue
+            expanded += 1
+            if url not in expansions:
+                systems = dict()
+                for system, code in codes:
+                    systems.setdefault(system, list()).append(code)
+                expansions[url] = {
+                    "url": url,
+                    "systems": [
+                        {"url": system, "codes": packed_lines(sorted(systems[system]))}
+                        for system in sorted(systems)
+                    ],
+                }
+            for info in known[class_name]:
+                if info["json_name"] == member or (
+                    member.endswith("[x]")
+                    and info["one_of_many"] == member[:-3]
+                    and info["type_name"] in self.coded_types
+                ):
+                    owned.setdefault(class_name, list()).append(
+                        {"name": info["name"], "path": path, "value_set": url}
+                    )
+        logger.info("{0} of {1} required bindings are expanded".format(expanded, bound))
+
+        bindings = list()
+        for class_name in sorted(known):
+            members = list()
+            for klass in analysis.chain(class_name):
+                members.extend(owned.get(klass.name, []))
+            if members:
+                bindings.append({"name": class_name, "members": members})
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "expansions": [expansions[url] for url in sorted(expansions)],
+            "bindings": bindings,
+        }
+        self.do_render(
+            data,
+            self.settings.BINDINGS_SOURCE_TEMPLATE,
+            self.settings.RESOURCE_TARGET_DIRECTORY
+            / self.settings.BINDINGS_TARGET_NAME,
+        )
+
+
 class FHIRValueSetRenderer(FHIRRenderer):
-    """Write ValueSet and CodeSystem contained in the FHIR spec."""
+    """Write ValueSet and CodeSystem contained in the FHIR spec: the codes,
+    displays and parent codes of every complete code system, sorted and
+    packed into strings the generated module turns into lookup tables.
+    """
 
     def render(self):
         if not self.settings.CODE_SYSTEMS_SOURCE_TEMPLATE:
@@ -379,43 +770,132 @@ class FHIRValueSetRenderer(FHIRRenderer):
             )
             return
 
-        systems = [v for k, v in self.spec.codesystems.items()]
+        compact_size = getattr(self.settings, "CODE_SYSTEMS_COMPACT_SIZE", 1000)
+        systems = list()
+        for codesystem in sorted(
+            self.spec.codesystems.values(), key=lambda x: x.url or ""
+        ):
+            definition = codesystem.definition
+            if definition.get("content") != "complete" or not codesystem.url:
+                continue
+            concepts = dict()
+            self.collect_concepts(definition.get("concept", []), None, concepts)
+            if not concepts:
+                continue
+            codes = sorted(concepts)
+            systems.append(
+                {
+                    "url": codesystem.url,
+                    "name": codesystem.name,
+                    "version": json.dumps(definition["version"])
+                    if definition.get("version")
+                    else None,
+                    "size": len(codes),
+                    "compact": len(codes) > compact_size,
+                    "codes": packed_lines(codes),
+                    "displays": packed_lines([concepts[code][0] for code in codes]),
+                    "parents": packed_lines([concepts[code][1] for code in codes]),
+                }
+            )
         data = {
             "info": self.spec.info,
-            "systems": sorted(systems, key=lambda x: x.name),
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "systems": systems,
         }
         target_name = self.settings.CODE_SYSTEMS_TARGET_NAME
-        target_path = os.path.join(self.settings.RESOURCE_TARGET_DIRECTORY, target_name)
+        target_path = self.settings.RESOURCE_TARGET_DIRECTORY / target_name
         self.do_render(data, self.settings.CODE_SYSTEMS_SOURCE_TEMPLATE, target_path)
 
+    def collect_concepts(self, concepts, parent, found):
+        """Adds ``code: (display, parent code)`` of the concepts and of their
+        nested concepts, first definition wins."""
+        for concept in concepts:
+            code = concept.get("code")
+            if not code or "\n" in code:
+                continue
+            if code not in found:
+                display = " ".join((concept.get("display") or "").split())
+                found[code] = (display, parent or "")
+            self.collect_concepts(concept.get("concept", []), code, found)
+
+
+class FHIRBenchmarkRenderer(FHIRRenderer):
+    """Write the performance benchmark suite of the generated models, timed
+    over the same example files as the unit tests."""
+
+    def render(self):
+        if not self.spec.unit_tests:
+            return
+        examples = dict()
+        for coll in self.spec.unit_tests:
+            tests = usable_tests(coll, self.settings.CURRENT_RELEASE_NAME)
+            examples[coll.klass.name] = sorted(set([tcase.filename for tcase in tests]))
+        target_path = (
+            self.settings.UNITTEST_TARGET_DIRECTORY
+            / self.settings.BENCHMARK_TARGET_NAME
+        )
+        data = {
+            "info": self.spec.info,
+            "release_name": self.settings.CURRENT_RELEASE_NAME,
+            "examples": sorted(examples.items()),
+            "module_name": target_path.stem,
+        }
+        self.do_render(data, self.settings.BENCHMARK_SOURCE_TEMPLATE, target_path)
+
 
 class FHIRUnitTestRenderer(FHIRRenderer):
-    """Write unit tests."""
+    """Write unit tests: one parametrized test per class, the expected values
+    of every example go to a compact JSON assertion table next to it."""
+
+    # kind of assertion per data type, others are validated through
+    # `ExternalValidatorModel.value<Type>`
+    assertion_kinds = {
+        "String": "str",
+        "Code": "str",
+        "Id": "str",
+        "Oid": "str",
+        "Xhtml": "str",
+        "Uuid": "str",
+        "Canonical": "str",
+        "Markdown": "str",
+        "Integer": "int",
+        "UnsignedInt": "int",
+        "PositiveInt": "int",
+        "Decimal": "decimal",
+        "NSDecimalNumber": "decimal",
+        "bool": "bool",
+        "Base64Binary": "Base64Binary",
+        "DateTime": "DateTime",
+        "Instant": "Instant",
+        "Date": "Date",
+        "Time": "Time",
+        "Uri": "Uri",
+        "Url": "Url",
+    }
+
+    def assertion_table(self, tests):
+        """ """
+        table = list()
+        for tcase in tests:
+            assertions = list()
+            for onetest in tcase.tests:
+                kind = self.assertion_kinds.get(onetest.klass.name)
+                if kind is None:
+                    # don't know how to create unit test
+                    continue
+                assertions.append([onetest.path, kind, onetest.value])
+            table.append(assertions)
+        return table
 
     def render(self):
         if not self.spec.unit_tests:
             return
+        canonical_module = None
+        if getattr(self.settings, "CANONICAL_SOURCE_TEMPLATE", None):
+            canonical_module = pathlib.Path(self.settings.CANONICAL_TARGET_NAME).stem
         # render all unit test collections
         for coll in self.spec.unit_tests:
-            tests = coll.tests
-            if (
-                self.settings.CURRENT_RELEASE_NAME in ("R4", "R4B")
-                and coll.klass.name == "Bundle"
-            ):
-                tests = [
-                    t
-                    for t in tests
-                    if t.filename
-                    not in ("profiles-types.json", "extension-definitions.json")
-                ]
-            data = {
-                "info": self.spec.info,
-                "class": coll.klass,
-                "tests": tests,
-                "profile": self.spec.profiles[coll.klass.name.lower()],
-                "release_name": self.settings.CURRENT_RELEASE_NAME,
-            }
-
+            tests = usable_tests(coll, self.settings.CURRENT_RELEASE_NAME)
             file_pattern = coll.klass.name
             if self.settings.RESOURCE_MODULE_LOWERCASE:
                 file_pattern = file_pattern.lower()
@@ -423,13 +903,36 @@ class FHIRUnitTestRenderer(FHIRRenderer):
                 file_pattern
             )
             file_path = self.settings.UNITTEST_TARGET_DIRECTORY / file_name
+            assertions_path = file_path.with_suffix(".json")
+
+            for tcase in tests:
+                # cost hint, i.e to balance test shards
+                tcase.size = tcase.filepath.stat().st_size
+            data = {
+                "info": self.spec.info,
+                "class": self.get_analysis().get_class(coll.klass.name),
+                "tests": tests,
+                "assertions_file": assertions_path.name,
+                "canonical_module": canonical_module,
+                "profile": self.get_analysis().get_profile(coll.klass.name),
+                "release_name": self.settings.CURRENT_RELEASE_NAME,
+            }
 
             self.do_render(data, self.settings.UNITTEST_SOURCE_TEMPLATE, file_path)
+            with io.open(assertions_path, "w", encoding="utf-8") as handle:
+                logger.info("Writing {}".format(assertions_path))
+                json.dump(
+                    self.assertion_table(tests),
+                    handle,
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
 
         # copy unit test files, if any
         if self.settings.UNITTEST_COPY_FILES is not None:
             for filepath in self.settings.UNITTEST_COPY_FILES:
                 if filepath.exists():
+                    self.sources.add(filepath)
                     target = self.settings.UNITTEST_TARGET_DIRECTORY / filepath.name
                     logger.info(
                         "Copying unittest file {} to {}".format(filepath.name, target)
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Streaming read of the definition bundles (``profiles-resources.json``,
+``valuesets.json``...): the entries of ``Bundle.entry`` are decoded one at a
+time from a buffer refilled by chunks, so only the current entry is held
+beside what the spec keeps of it, instead of the text of the whole file and
+its full object tree."""
+import json
+import pathlib
+import typing
+
+import fhirspec
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+WHITESPACE = " \t\n\r"
+# characters of a JSON number
+NUMBER = "0123456789+-.eE"
+
+
+class BundleStreamError(ValueError):
+    """The file is not a JSON object, or is truncated."""
+
+
+class _Buffer:
+    """Text of a file read by chunks, ``pos`` is the offset of the next value
+    to decode; decoded text is dropped when refilling."""
+
+    def __init__(self, fp: typing.TextIO, chunk_size: int):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size: typing.Optional[int] = None) -> bool:
+        """Reads at least one chunk more, returns False at end of file."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(max(size or 0, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips whitespace, returns the next character ("" at end of file)."""
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        """Consumes the next character, which must be one of ``characters``."""
+        character = self.peek()
+        if character == "" or character not in characters:
+            raise BundleStreamError(
+                "Expecting one of {0!r}, found {1!r}".format(characters, character)
+            )
+        self.pos += 1
+        return character
+
+    def decode(self, decoder: json.JSONDecoder) -> typing.Any:
+        """Decodes the next JSON value, reading more while it is incomplete
+        (the buffer at least doubles each time)."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill(len(self.text) - self.pos):
+                    raise
+                continue
+            # a number may go on in the next chunk
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                following = self.text[end : end + 1]
+                if (not following or following in NUMBER) and self.fill():
+                    continue
+            self.pos = end
+            return value
+
+
+def iter_bundle_entries(
+    filepath: pathlib.Path,
+    header: typing.Optional[typing.Dict[str, typing.Any]] = None,
+    chunk_size: int = 1 << 20,
+) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+    """Yields the items of ``entry`` of the JSON object in a file one by one.
+    The other members of the object (``resourceType``, ``type``...) are put
+    in ``header`` when given, those after ``entry`` once all are read;
+    ``entry`` itself is put there as None."""
+    header = header if header is not None else dict()
+    decoder = json.JSONDecoder()
+    with open(str(filepath), "r", encoding="utf-8") as fp:
+        buffer = _Buffer(fp, chunk_size)
+        buffer.expect("{")
+        if buffer.peek() == "}":
+            return
+        while True:
+            key = buffer.decode(decoder)
+            buffer.expect(":")
+            if key != "entry" or buffer.peek() != "[":
+                header[key] = buffer.decode(decoder)
+            else:
+                header[key] = None
+                buffer.expect("[")
+                if buffer.peek() == "]":
+                    buffer.expect("]")
+                else:
+                    while True:
+                        yield buffer.decode(decoder)
+                        if buffer.expect(",]") == "]":
+                            break
+            if buffer.expect(",}") == "}":
+                return
+
+
+class StreamingFHIRSpec(fhirspec.FHIRSpec):
+    """``FHIRSpec`` reading the bundles with ``iter_bundle_entries``: the
+    resources are yielded to the value set and profile readers as they are
+    decoded."""
+
+    def read_bundle_resources(
+        self, filename: str
+    ) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """Yields the ``resource`` of the entries of a Bundle, with the checks
+        of ``FHIRSpec.read_bundle_resources``. ``resourceType`` is checked
+        before the first entry when it comes first (as in the definition
+        bundles); when it comes after ``entry`` it can only be checked once
+        all the entries were yielded, the readers may then have used them."""
+        fhirspec.LOGGER.info(f"Reading {filename}")
+        filepath = self.definition_directory / filename
+        header: typing.Dict[str, typing.Any] = dict()
+        checked = False
+        for entry in iter_bundle_entries(filepath, header):
+            if not checked and "resourceType" in header:
+                self.check_bundle_header(header, filepath)
+                checked = True
+            yield entry["resource"]
+        self.check_bundle_header(header, filepath)
+
+    def check_bundle_header(
+        self, header: typing.Dict[str, typing.Any], filepath: pathlib.Path
+    ):
+        """ """
+        if "resourceType" not in header:
+            raise Exception(
+                f'Expecting "resourceType" to be present, but is not in {filepath}'
+            )
+        if "Bundle" != header["resourceType"]:
+            raise Exception('Can only process "Bundle" resources')
+        if "entry" not in header:
+            raise Exception(f"There are no entries in the Bundle at {filepath}")
+
+
+def load_spec(
+    settings: fhirspec.Configuration, spec_source: pathlib.Path
+) -> fhirspec.FHIRSpec:
+    """Loads the specification, streaming the bundles unless
+    ``STREAM_BUNDLES`` is off."""
+    if getattr(settings, "STREAM_BUNDLES", True):
+        return StreamingFHIRSpec(settings, spec_source)
+    return fhirspec.FHIRSpec(settings, spec_source)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Watch mode of ``generate.py``: the specification is loaded and analyzed
+once and stays resident, the templates and the configuration are polled
+for changes. A changed template (or copied file) renders again only the
+outputs of the renderers which read it, a changed configuration is applied
+to the settings and renders everything again, from the same specification."""
+import importlib
+import pathlib
+import sys
+import time
+import typing
+
+import fhirspec
+
+import config
+from logger import logger
+from utils import ResourceWriter
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+
+def load_settings() -> typing.Dict[str, typing.Any]:
+    """Reloads the configuration modules, returns the settings they define."""
+    for name in ("config.base", "config.base_local"):
+        if name in sys.modules:
+            importlib.reload(sys.modules[name])
+    importlib.reload(config)
+    return fhirspec.Configuration.from_module(config).as_dict()
+
+
+class Watcher:
+    """Renders the outputs of a resident specification again when their
+    sources change."""
+
+    def __init__(self, spec: fhirspec.FHIRSpec, settings: fhirspec.Configuration):
+        self.spec = spec
+        self.settings = settings
+        self.writer = ResourceWriter(spec)
+        self.config_files = sorted(pathlib.Path(config.__file__).parent.glob("*.py"))
+        self.config = load_settings()
+        self.analysis = None
+        self.renderers = list()
+        self.mtimes: typing.Dict[pathlib.Path, int] = dict()
+
+    def watched_files(self) -> typing.List[pathlib.Path]:
+        """The configuration, the template directory and the sources read by
+        the renderers."""
+        # as the template loader, next to ``generate.py``
+        template_directory = (
+            pathlib.Path(__file__).parent / self.settings.TEMPLATE_DIRECTORY
+        )
+        files = set(self.config_files)
+        files.update([path for path in template_directory.rglob("*") if path.is_file()])
+        for renderer in self.renderers:
+            files.update(renderer.sources)
+        return sorted([path for path in files if "__pycache__" not in path.parts])
+
+    def stat(self) -> typing.Dict[pathlib.Path, int]:
+        """ """
+        mtimes = dict()
+        for path in self.watched_files():
+            try:
+                mtimes[path] = path.stat().st_mtime_ns
+            except OSError:
+                continue
+        return mtimes
+
+    def poll(self) -> typing.Set[pathlib.Path]:
+        """Returns the files changed (or added, removed) since the last poll."""
+        mtimes = self.stat()
+        changed = set(
+            [
+                path
+                for path in set(mtimes) | set(self.mtimes)
+                if mtimes.get(path) != self.mtimes.get(path)
+            ]
+        )
+        self.mtimes = mtimes
+        return changed
+
+    def render(self, renderers):
+        """Renders, a failing renderer is logged and the others go on."""
+        start = time.perf_counter()
+        for renderer in renderers:
+            renderer.sources.clear()
+            try:
+                renderer.render()
+            except Exception:
+                logger.exception(
+                    "{0} failed, fix the sources and save again".format(
+                        type(renderer).__name__
+                    )
+                )
+        logger.info(
+            "Rendered {0} in {1:.3f} s".format(
+                ", ".join([type(renderer).__name__ for renderer in renderers]),
+                time.perf_counter() - start,
+            )
+        )
+
+    def reconfigure(self) -> bool:
+        """Applies the settings changed in the configuration since it was last
+        loaded (the command line overrides stay otherwise), and analyzes the
+        specification again. Returns whether the configuration could be
+        loaded."""
+        try:
+            loaded = load_settings()
+        except Exception:
+            logger.exception("Cannot load the configuration")
+            return False
+        changes = dict(
+            [
+                (key, value)
+                for key, value in loaded.items()
+                if key not in self.config or self.config[key] != value
+            ]
+        )
+        self.config = loaded
+        self.settings.update(changes)
+        if changes:
+            logger.info("Settings changed: {0}".format(", ".join(sorted(changes))))
+        self.analysis = self.writer.analyze()
+        self.renderers = self.writer.renderers(self.analysis)
+        return True
+
+    def write(self):
+        """Writes all outputs, as ``FHIRSpec.write``, keeping the renderers
+        which know their sources then."""
+        self.analysis = self.writer.analyze()
+        self.renderers = self.writer.renderers(self.analysis)
+        for renderer in self.renderers:
+            renderer.render()
+        self.mtimes = self.stat()
+
+    def run(self):
+        """Polls every ``WATCH_INTERVAL`` seconds until interrupted, see
+        ``write`` for the first rendering."""
+        logger.info(
+            "Watching {0} files for changes, press Ctrl+C to stop".format(
+                len(self.mtimes)
+            )
+        )
+        try:
+            while True:
+                time.sleep(getattr(self.settings, "WATCH_INTERVAL", 0.25))
+                changed = self.poll()
+                if not changed:
+                    continue
+                logger.info(
+                    "Changed: {0}".format(
+                        ", ".join(sorted([path.name for path in changed]))
+                    )
+                )
+                if changed & set(self.config_files):
+                    if self.reconfigure():
+                        self.render(self.renderers)
+                    continue
+                renderers = [
+                    renderer
+                    for renderer in self.renderers
+                    if changed & renderer.sources
+                ]
+                if renderers:
+                    self.render(renderers)
+                # sources of the renderers may have changed, i.e a new include
+                for path, mtime in self.stat().items():
+                    self.mtimes.setdefault(path, mtime)
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
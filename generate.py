@@ -12,7 +12,11 @@ import sys
 
 import config
 import fhirloader
+import fhirstream
+import fhirwatch
 import fhirspec
+import outputarchive
+import outputcheck
 import typing
 import click
 import pathlib
@@ -34,6 +38,13 @@ _cache_path = "downloads"
     required=False,
 )
 @click.option("--dry-run", "-d", is_flag=True, default=False, help="Dry Run")
+@click.option(
+    "--watch",
+    "-w",
+    is_flag=True,
+    default=False,
+    help="Keep the spec loaded, render again on template or config changes",
+)
 @click.option(
     "--force-download", "-f", is_flag=True, default=False, help="Force Download"
 )
@@ -68,6 +79,7 @@ _cache_path = "downloads"
 )
 def main(
     dry_run: bool,
+    watch: bool,
     force_download: bool,
     load_only: bool,
     cache_only: bool,
@@ -104,8 +116,14 @@ def main(
     settings.update(updates)
 
     spec_source = load(settings, force_download=force_download, cache_only=cache_only)
+    failures = 0
     if load_only is False:
-        generate_from_fhir_spec(spec_source, settings, dry_run=dry_run)
+        failures += generate_from_fhir_spec(
+            spec_source, settings, dry_run=dry_run, watch=watch
+        )
+    if watch:
+        # previous releases are not built while watching
+        return 1 if failures else 0
 
     # checks for previous version maintain handler
     current_version = settings["CURRENT_RELEASE_NAME"]
@@ -149,7 +167,9 @@ def main(
                 settings, force_download=force_download, cache_only=cache_only
             )
             if load_only is False:
-                generate_from_fhir_spec(spec_source, settings, dry_run=dry_run)
+                failures += generate_from_fhir_spec(
+                    spec_source, settings, dry_run=dry_run
+                )
                 if dry_run is False:
                     update_pytest_fixture(settings)
 
@@ -157,7 +177,7 @@ def main(
         fhirspec.FHIRClass.__known_classes__ = {}
         settings.update(originals)
 
-    return 0
+    return 1 if failures else 0
 
 
 def load(settings: fhirspec.Configuration, force_download: bool, cache_only: bool):
@@ -170,15 +190,38 @@ def load(settings: fhirspec.Configuration, force_download: bool, cache_only: boo
 
 
 def generate_from_fhir_spec(
-    spec_source: pathlib.Path, settings: fhirspec.Configuration, dry_run: bool
-):
-    """ """
-    spec = fhirspec.FHIRSpec(settings, spec_source)
+    spec_source: pathlib.Path,
+    settings: fhirspec.Configuration,
+    dry_run: bool,
+    watch: bool = False,
+) -> int:
+    """Returns the number of problems found by the checks of the output.
+    With ``watch``, keeps rendering on changes (see ``fhirwatch``) after the
+    checks, until interrupted."""
+    spec = fhirstream.load_spec(settings, spec_source)
+    failures = 0
+    watcher = None
     if dry_run is False:
-        spec.write()
+        if watch:
+            watcher = fhirwatch.Watcher(spec, settings)
+            watcher.write()
+        else:
+            spec.write()
         # ensure init py has been created
         ensure_init_py(settings, spec.info)
 
+        if getattr(settings, "COMPILE_GENERATED", False):
+            failures += outputcheck.compile_generated(settings)
+        if getattr(settings, "SMOKE_IMPORT_GENERATED", False):
+            failures += outputcheck.smoke_import_generated(settings)
+        if getattr(settings, "IMPORT_PROFILE", False):
+            failures += outputcheck.run_import_profile(settings)
+        if getattr(settings, "WRITE_ARCHIVE", False):
+            failures += outputarchive.write_archive(settings)
+        if watcher is not None:
+            watcher.run()
+    return failures
+
 
 if "__main__" == __name__:
     try:
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Packs the generated package into one archive, after the spec has been
+written: a pure Python wheel, which also works on ``sys.path`` as it is
+(``zipimport``). Every module is packed with its ``.pyc`` next to it,
+compiled with unchecked hashes, so importing from the archive never looks
+at the sources nor at their modification time."""
+import base64
+import hashlib
+import pathlib
+import py_compile
+import re
+import tempfile
+import typing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from fhirspec import resolve_path
+
+from logger import logger
+from outputcheck import module_root
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# fixed timestamp of the archive members, the archive of the same output is
+# identical byte for byte
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+WHEEL = """Wheel-Version: 1.0
+Generator: fhir-parser
+Root-Is-Purelib: true
+Tag: py3-none-any
+"""
+
+
+def package_directory(settings) -> pathlib.Path:
+    """Returns the directory of the top level generated package
+    (``fhir/resources``), which contains the previous releases too."""
+    root, _ = module_root(settings)
+    return root / "fhir" / "resources"
+
+
+def package_version(settings) -> str:
+    """Returns ``ARCHIVE_VERSION`` or else the FHIR version written in the
+    ``__init__`` of the package (see ``utils.ensure_init_py``)."""
+    version = getattr(settings, "ARCHIVE_VERSION", None)
+    if version:
+        return version
+    init_py = package_directory(settings) / "__init__.py"
+    with open(init_py, "r", encoding="utf-8") as fp:
+        for line in fp:
+            if line.startswith("__fhir_version__"):
+                return line.split("=", 1)[1].strip().strip("\"'")
+    raise ValueError("No __fhir_version__ in {0}".format(init_py))
+
+
+def archive_files(settings) -> typing.List[typing.Tuple[pathlib.Path, str]]:
+    """Returns the files to pack and their names in the archive, relative to
+    the directory on ``sys.path``. Byte-code caches are left out, the unit
+    tests are packed when they are written inside the package."""
+    root, _ = module_root(settings)
+    files = list()
+    namespace_init = root / "fhir" / "__init__.py"
+    if namespace_init.exists():
+        files.append(namespace_init)
+    for filepath in sorted(package_directory(settings).rglob("*")):
+        if not filepath.is_file() or "__pycache__" in filepath.parts:
+            continue
+        if filepath.suffix in (".pyc", ".pyo"):
+            continue
+        files.append(filepath)
+    return [(filepath, filepath.relative_to(root).as_posix()) for filepath in files]
+
+
+def _compile_member(args: typing.Tuple[str, str, str]) -> typing.Optional[str]:
+    """Compiles one module to ``cfile`` with an unchecked hash, ``dfile`` is
+    its name in the archive. Returns the error message if it cannot be
+    compiled."""
+    filepath, cfile, dfile = args
+    try:
+        py_compile.compile(
+            filepath,
+            cfile=cfile,
+            dfile=dfile,
+            doraise=True,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+    except py_compile.PyCompileError as exc:
+        return exc.msg
+    return None
+
+
+def _record_hash(data: bytes) -> str:
+    """ """
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest())
+    return "sha256=" + digest.rstrip(b"=").decode("ascii")
+
+
+def _distribution(name: str) -> str:
+    """The escaped distribution name of the wheel file name."""
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def archive_path(settings, version: typing.Optional[str] = None) -> pathlib.Path:
+    """Returns the path of the wheel in ``ARCHIVE_TARGET_DIRECTORY``."""
+    if version is None:
+        version = package_version(settings)
+    directory = resolve_path(settings.ARCHIVE_TARGET_DIRECTORY, settings.BASE_PATH)
+    return directory / "{0}-{1}-py3-none-any.whl".format(
+        _distribution("fhir.resources"), version.replace("-", "_")
+    )
+
+
+def metadata(settings, version: str) -> str:
+    """ """
+    lines = [
+        "Metadata-Version: 2.1",
+        "Name: fhir.resources",
+        "Version: {0}".format(version),
+        "Summary: FHIR Resources as Model Class (FHIR release {0})".format(
+            settings.CURRENT_RELEASE_NAME
+        ),
+    ]
+    lines.extend(
+        [
+            "Requires-Dist: {0}".format(requirement)
+            for requirement in getattr(settings, "ARCHIVE_REQUIREMENTS", [])
+        ]
+    )
+    return "\n".join(lines) + "\n"
+
+
+def write_archive(settings) -> int:
+    """Writes the wheel of the generated package to ``ARCHIVE_TARGET_DIRECTORY``
+    and returns the number of modules which cannot be compiled (the archive
+    is not written then)."""
+    version = package_version(settings)
+    files = archive_files(settings)
+    modules = [(filepath, name) for filepath, name in files if name.endswith(".py")]
+    logger.info("Packing {0} files into an archive".format(len(files)))
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        compiled = [
+            str(pathlib.Path(tmpdir) / "{0}.pyc".format(index))
+            for index in range(len(modules))
+        ]
+        workers = getattr(settings, "COMPILE_WORKERS", None)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            errors = list(
+                executor.map(
+                    _compile_member,
+                    [
+                        (str(filepath), cfile, name)
+                        for (filepath, name), cfile in zip(modules, compiled)
+                    ],
+                    chunksize=16,
+                )
+            )
+        failures = 0
+        for (filepath, _), error in zip(modules, errors):
+            if error is not None:
+                failures += 1
+                logger.error("Cannot compile {0}: {1}".format(filepath, error))
+        if failures:
+            return failures
+
+        members = [(name, filepath) for filepath, name in files]
+        members.extend(
+            [
+                (name + "c", pathlib.Path(cfile))
+                for (_, name), cfile in zip(modules, compiled)
+            ]
+        )
+        members.sort()
+
+        target = archive_path(settings, version)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        dist_info = target.name.split("-py3-")[0] + ".dist-info"
+        records = list()
+        with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+
+            def add(name: str, data: bytes):
+                info = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                archive.writestr(info, data)
+                records.append(
+                    "{0},{1},{2}".format(name, _record_hash(data), len(data))
+                )
+
+            for name, filepath in members:
+                add(name, filepath.read_bytes())
+            add(dist_info + "/METADATA", metadata(settings, version).encode("utf-8"))
+            add(dist_info + "/WHEEL", WHEEL.encode("utf-8"))
+            records.append(dist_info + "/RECORD,,")
+            add(dist_info + "/RECORD", ("\n".join(records) + "\n").encode("utf-8"))
+    logger.info("Archive has been written to {0}".format(target))
+    return 0
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Checks run on the generated output, after the spec has been written:
+byte-compiling, smoke-importing and import profiling."""
+import json
+import os
+import pathlib
+import platform
+import py_compile
+import subprocess
+import sys
+import time
+import typing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fhirspec import resolve_path
+
+from logger import logger
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# imports one module in a fresh interpreter and prints its memory footprint
+IMPORT_PROBE = """
+import gc, json, os, sys
+
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+gc.collect()
+before = rss_kb()
+# ``-X importtime`` only reports imports made through ``__import__``
+__import__(sys.argv[1])
+module = sys.modules[sys.argv[1]]
+gc.collect()
+after = rss_kb()
+namespace = vars(module)
+size = sys.getsizeof(namespace) + sum(map(sys.getsizeof, namespace.values()))
+sys.stdout.write(json.dumps({"rss_kb": after - before, "size_bytes": size}))
+"""
+
+
+def module_root(settings) -> typing.Tuple[pathlib.Path, str]:
+    """Returns the directory to put on ``sys.path`` and the dotted name of the
+    generated package."""
+    module_path = "fhir.resources"
+    if settings.CURRENT_RELEASE_NAME != settings.DEFAULT_FHIR_RELEASE:
+        module_path += "." + settings.CURRENT_RELEASE_NAME
+    root = settings.RESOURCE_TARGET_DIRECTORY
+    for _ in module_path.split("."):
+        root = root.parent
+    return root, module_path
+
+
+def generated_modules(settings) -> typing.List[str]:
+    """Returns the dotted names of the generated modules, tests excluded."""
+    _, module_path = module_root(settings)
+    modules = list()
+    for filepath in sorted(settings.RESOURCE_TARGET_DIRECTORY.glob("*.py")):
+        if filepath.name == "__init__.py":
+            modules.append(module_path)
+        else:
+            modules.append(module_path + "." + filepath.stem)
+    return modules
+
+
+def _python_env(root: pathlib.Path) -> typing.Dict[str, str]:
+    """ """
+    env = os.environ.copy()
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(root)] + [p for p in [env.get("PYTHONPATH")] if p]
+    )
+    return env
+
+
+def profile_url(filepath: pathlib.Path) -> typing.Optional[str]:
+    """Returns the profile URL a generated module was rendered from, as
+    written in its header."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as fp:
+            for _, line in zip(range(10), fp):
+                if line.startswith("Profile: "):
+                    return line[len("Profile: ") :].strip()
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def _describe(filepath: pathlib.Path) -> str:
+    """ """
+    url = profile_url(filepath)
+    if url is None:
+        return str(filepath)
+    return "{0} (profile {1})".format(filepath, url)
+
+
+def _compile_file(filepath: str) -> typing.Optional[str]:
+    """Byte-compiles one module next to it in ``__pycache__``, returns the
+    error message if it cannot be compiled."""
+    try:
+        py_compile.compile(filepath, doraise=True)
+    except py_compile.PyCompileError as exc:
+        return exc.msg
+    return None
+
+
+def compile_generated(settings) -> int:
+    """Byte-compiles all generated modules in parallel (process pool), the
+    ``.pyc`` files are kept so the first import is fast too. Returns the
+    number of modules which cannot be compiled."""
+    directories = [settings.RESOURCE_TARGET_DIRECTORY]
+    if getattr(settings, "WRITE_UNITTESTS", False):
+        directories.append(settings.UNITTEST_TARGET_DIRECTORY)
+    files = sorted(
+        set([filepath for directory in directories for filepath in directory.rglob("*.py")])
+    )
+    logger.info("Byte-compiling {0} generated modules".format(len(files)))
+    workers = getattr(settings, "COMPILE_WORKERS", None)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        errors = list(executor.map(_compile_file, map(str, files), chunksize=16))
+    failures = 0
+    for filepath, error in zip(files, errors):
+        if error is not None:
+            failures += 1
+            logger.error("Cannot compile {0}: {1}".format(_describe(filepath), error))
+    return failures
+
+
+def _smoke_import(root: pathlib.Path, module: str) -> typing.Optional[str]:
+    """Imports the module alone in a fresh interpreter, returns the last
+    line of the traceback if it fails."""
+    proc = subprocess.run(
+        [sys.executable, "-c", "import " + module],
+        capture_output=True,
+        text=True,
+        env=_python_env(root),
+    )
+    if proc.returncode == 0:
+        return None
+    lines = proc.stderr.strip().splitlines()
+    return lines[-1] if lines else "exit code {0}".format(proc.returncode)
+
+
+def smoke_import_generated(settings) -> int:
+    """Imports every generated module in isolation, returns the number of
+    modules which cannot be imported."""
+    root, _ = module_root(settings)
+    modules = generated_modules(settings)
+    logger.info("Smoke-importing {0} generated modules".format(len(modules)))
+    workers = getattr(settings, "COMPILE_WORKERS", None) or os.cpu_count()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        errors = list(executor.map(lambda module: _smoke_import(root, module), modules))
+    failures = 0
+    for module, error in zip(modules, errors):
+        if error is not None:
+            failures += 1
+            filepath = settings.RESOURCE_TARGET_DIRECTORY / (
+                module.rpartition(".")[2] + ".py"
+            )
+            if not filepath.exists():
+                filepath = settings.RESOURCE_TARGET_DIRECTORY / "__init__.py"
+            logger.error("Cannot import {0}: {1}".format(_describe(filepath), error))
+    return failures
+
+
+def profile_import(root: pathlib.Path, module: str) -> typing.Dict[str, typing.Any]:
+    """Imports the module in a clean subprocess with ``-X importtime``, returns
+    its cumulative and own import time (microseconds), the RSS growth (KiB)
+    and the shallow size of the module namespace (bytes)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_PROBE, module],
+        capture_output=True,
+        text=True,
+        env=_python_env(root),
+    )
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return {"error": lines[-1] if lines else "exit code {0}".format(proc.returncode)}
+
+    result = json.loads(proc.stdout)
+    result["import_us"] = result["self_us"] = 0
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        if parts[2].strip() == module:
+            result["self_us"] = int(parts[0])
+            result["import_us"] = int(parts[1])
+    return result
+
+
+def profile_imports(settings) -> typing.Dict[str, typing.Any]:
+    """Profiles the import of every generated module, see ``profile_import``."""
+    root, _ = module_root(settings)
+    modules = generated_modules(settings)
+    workers = getattr(settings, "IMPORT_PROFILE_WORKERS", 1) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda module: profile_import(root, module), modules)
+        profiles = dict(zip(modules, results))
+    return {
+        "release": settings.CURRENT_RELEASE_NAME,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "modules": profiles,
+    }
+
+
+def compare_profiles(
+    report: typing.Dict[str, typing.Any],
+    baseline: typing.Dict[str, typing.Any],
+    thresholds: typing.Dict[str, typing.Tuple[float, float]],
+) -> typing.List[str]:
+    """Returns the regressions of a report against a baseline report.
+    ``thresholds`` maps a measure to ``(ratio, minimum difference)``: a
+    module regresses when both are exceeded, small absolute changes are
+    ignored as noise."""
+    regressions = list()
+    for module, profile in report["modules"].items():
+        previous = baseline.get("modules", {}).get(module)
+        # failed imports are reported on their own
+        if previous is None or "error" in previous or "error" in profile:
+            continue
+        for measure, (ratio, minimum) in thresholds.items():
+            if measure not in profile or measure not in previous:
+                continue
+            value, before = profile[measure], previous[measure]
+            if value - before > minimum and value > before * ratio:
+                regressions.append(
+                    "{0}: {1} {2} -> {3}".format(module, measure, before, value)
+                )
+    return regressions
+
+
+def release_path(path: typing.Any, settings) -> pathlib.Path:
+    """Returns the location of a per release file: the release name is
+    appended to the file name, i.e ``import-profile-R5.json``."""
+    path = resolve_path(path, settings.BASE_PATH)
+    return path.with_name(
+        "{0}-{1}{2}".format(path.stem, settings.CURRENT_RELEASE_NAME, path.suffix)
+    )
+
+
+def run_import_profile(settings) -> int:
+    """Profiles the imports of the generated package, writes the report and
+    compares it with the baseline (if any). Returns the number of
+    regressions and failed imports."""
+    logger.info("Profiling imports of the generated modules")
+    report = profile_imports(settings)
+    failures = 0
+    for module, profile in report["modules"].items():
+        if "error" in profile:
+            failures += 1
+            logger.error("Cannot import {0}: {1}".format(module, profile["error"]))
+
+    report_path = release_path(settings.IMPORT_PROFILE_REPORT, settings)
+    with open(report_path, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2, sort_keys=True)
+    logger.info("Import profile has been written to {0}".format(report_path))
+
+    baseline_path = getattr(settings, "IMPORT_PROFILE_BASELINE", None)
+    if not baseline_path:
+        return failures
+    baseline_path = release_path(baseline_path, settings)
+    if not baseline_path.exists():
+        logger.warning(
+            "Import profile baseline {0} does not exist, copy the report "
+            "there to create it".format(baseline_path)
+        )
+        return failures
+    with open(baseline_path, "r", encoding="utf-8") as fp:
+        baseline = json.load(fp)
+    regressions = compare_profiles(
+        report, baseline, settings.IMPORT_PROFILE_THRESHOLDS
+    )
+    for regression in regressions:
+        logger.error("Import regression {0}".format(regression))
+    return failures + len(regressions)
@@ -0,0 +1,77 @@
+"""Compiled element path accessors compared with naive ``getattr`` walking.
+
+Usage: ``python -m fhir.resources.tests.bench_accessors [--repeat N]``
+"""
+import json
+import sys
+
+from .. import fhiraccessors, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+PATHS = [
+    "Observation.code.coding.code",
+    "Observation.subject.reference",
+    "Observation.valueQuantity.value",
+    "Observation.component.code.coding.system",
+    "Patient.identifier.value",
+    "Patient.name.given",
+    "Bundle.entry.fullUrl",
+    "Bundle.entry.resource.id",
+]
+
+
+def naive_walk(resource, path):
+    """Walks the path with ``getattr``, checking every value at runtime."""
+    nodes = [resource]
+    for name in path.split(".")[1:]:
+        found = list()
+        for node in nodes:
+            value = getattr(node, name, None)
+            if value is None:
+                continue
+            if isinstance(value, list):
+                found.extend([item for item in value if item is not None])
+            else:
+                found.append(value)
+        nodes = found
+    return nodes
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    resources = dict()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            klass = get_fhir_model_class(document["resourceType"])
+            model = klass.model_validate(document)
+        except Exception:
+            continue
+        resources.setdefault(document["resourceType"], list()).append(model)
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for path in PATHS:
+        models = resources.get(path.split(".")[0])
+        if not models:
+            continue
+        try:
+            accessor = fhiraccessors.compile_path(path)
+        except ValueError:
+            sys.stdout.write("{0}: not available in this release\n".format(path))
+            continue
+        report(
+            path + " (getattr)",
+            measure(lambda: [naive_walk(m, path) for m in models], **options),
+        )
+        report(
+            path + " (compiled)",
+            measure(lambda: [accessor(m) for m in models], **options),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""Required binding checks of the examples (parsed once), against the
+expansions generated with the models.
+
+Usage: ``python -m fhir.resources.tests.bench_bindings [--repeat N]``
+"""
+import json
+import sys
+
+from .. import fhirbindings, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    models = dict()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            resource = get_fhir_model_class(document["resourceType"]).model_validate(
+                document
+            )
+        except Exception:
+            continue
+        models.setdefault(document["resourceType"], list()).append(resource)
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for resource_type, items in sorted(models.items()):
+        items = items * args.copies
+        report(
+            f"{resource_type} (bindings)",
+            measure(
+                lambda: [fhirbindings.validate_bindings(m) for m in items], **options
+            ),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Canonical content hashing of a large Bundle compared with hashing the
+re-sorted ``model_dump_json`` output.
+
+Usage: ``python -m fhir.resources.tests.bench_canonical [--repeat N] [--copies 100]``
+"""
+import hashlib
+import json
+import sys
+
+from .. import fhircanonical, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def dump_and_sort(model):
+    """The usual way: dump, reload, re-sort keys and hash."""
+    data = json.loads(model.model_dump_json())
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    entries = list()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        if document.get("resourceType") in (None, "Bundle"):
+            continue
+        try:
+            get_fhir_model_class(document["resourceType"]).model_validate(document)
+        except Exception:
+            continue
+        entries.append({"fullUrl": "urn:uuid:{0}".format(name), "resource": document})
+    if not entries:
+        sys.stdout.write("No examples available\n")
+        return 1
+    document = {
+        "resourceType": "Bundle",
+        "type": "collection",
+        "entry": entries * args.copies,
+    }
+    bundle = get_fhir_model_class("Bundle").model_validate(document)
+    sys.stdout.write(
+        "Bundle of {0} entries, {1} canonical bytes\n".format(
+            len(document["entry"]), len(fhircanonical.canonical_json(bundle))
+        )
+    )
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    report("model_dump_json + sort + sha256", measure(lambda: dump_and_sort(bundle), **options))
+    report(
+        "content_hash (model)",
+        measure(lambda: fhircanonical.content_hash(bundle), **options),
+    )
+    report(
+        "content_hash (JSON)",
+        measure(lambda: fhircanonical.content_hash(document), **options),
+    )
+    report(
+        "canonical_json (model)",
+        measure(lambda: fhircanonical.canonical_json(bundle), **options),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
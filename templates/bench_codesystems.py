@@ -0,0 +1,64 @@
+"""Code lookups in the code system tables, with sets and dicts and with the
+compact (binary search) representation, over all the codes of every system
+(and as many unknown codes). Also reports the time and memory it takes to
+build the tables.
+
+Usage: ``python -m fhir.resources.tests.bench_codesystems [--repeat N]``
+"""
+import sys
+import tracemalloc
+
+from .. import codesystems
+from .benchutils import measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def _build(klass):
+    return [klass(data) for data in codesystems.SYSTEMS.values()]
+
+
+def _allocated(klass) -> int:
+    tracemalloc.start()
+    try:
+        tables = _build(klass)
+        allocated = tracemalloc.get_traced_memory()[0]
+        del tables
+        return allocated
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    lookups = list()
+    for url, data in codesystems.SYSTEMS.items():
+        for code in data.codes.split("\n"):
+            lookups.append((url, code))
+            lookups.append((url, code + "-unknown"))
+    lookups = lookups * args.copies
+
+    for label, klass in (
+        ("sets", codesystems.CodeSystemTable),
+        ("compact", codesystems.CompactCodeSystemTable),
+    ):
+        tables = dict(
+            [(url, klass(data)) for url, data in codesystems.SYSTEMS.items()]
+        )
+        report(
+            f"{len(lookups)} lookups ({label})",
+            measure(lambda: [code in tables[url] for url, code in lookups], **options),
+        )
+        report(f"build {len(tables)} tables ({label})", measure(lambda: _build(klass)))
+        sys.stdout.write(
+            "{0:<48} {1:>10.1f} KiB\n".format(
+                f"memory of the tables ({label})", _allocated(klass) / 1024
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Compiled FHIRPath expressions compared with parsing and lowering them for
+every resource (and with ``fhirpathpy`` on the JSON, if installed), over
+common search-parameter expressions. The expressions of each resource type
+are also evaluated one by one and as a batch.
+
+Usage: ``python -m fhir.resources.tests.bench_fhirpath [--repeat N] [--workers N]``
+"""
+import json
+import sys
+
+from .. import fhirpath, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+try:
+    import fhirpathpy
+except ImportError:
+    fhirpathpy = None
+
+# resource type: search-parameter expressions
+EXPRESSIONS = {
+    "Patient": [
+        "Patient.identifier",
+        "Patient.name.family",
+        "Patient.birthDate",
+        "Patient.gender",
+        "Patient.deceased.exists() and Patient.deceased != false",
+        "Patient.telecom.where(system='phone')",
+        "Patient.managingOrganization",
+        "Patient.link.other.where(resolve() is Patient)",
+    ],
+    "Observation": [
+        "Observation.code",
+        "Observation.subject.where(resolve() is Patient)",
+        "Observation.effective.ofType(dateTime) | Observation.effective.ofType(Period)",
+        "(Observation.value as Quantity)",
+        "Observation.category",
+        "Observation.component.code",
+        "Observation.identifier | Observation.hasMember",
+    ],
+    "Organization": [
+        "Organization.name | Organization.alias",
+        "Organization.identifier",
+        "Organization.partOf",
+    ],
+    "Questionnaire": [
+        "Questionnaire.url",
+        "Questionnaire.status",
+        "Questionnaire.item.linkId",
+    ],
+    "Bundle": [
+        "Bundle.identifier",
+        "Bundle.entry[0].resource as Composition",
+        "Bundle.type",
+    ],
+}
+
+
+def _compiles(expression, resource_type):
+    try:
+        fhirpath.compile_expression(expression, resource_type)
+    except ValueError:
+        return False
+    return True
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Also time the batch evaluation with a pool of processes",
+    )
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv, add_arguments)
+    resources = dict()
+    for name, content in iter_examples(args.resource_types or list(EXPRESSIONS)):
+        document = json.loads(content)
+        try:
+            klass = get_fhir_model_class(document["resourceType"])
+            model = klass.model_validate(document)
+        except Exception:
+            continue
+        resources.setdefault(document["resourceType"], list()).append((document, model))
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for resource_type, expressions in EXPRESSIONS.items():
+        documents = [document for document, _ in resources.get(resource_type, ())]
+        models = [model for _, model in resources.get(resource_type, ())]
+        if not models:
+            continue
+        models = models * args.copies
+        documents = documents * args.copies
+        for expression in expressions:
+            try:
+                compiled = fhirpath.compile_expression(expression, resource_type)
+            except ValueError as exc:
+                sys.stdout.write("{0}: {1}\n".format(expression, exc))
+                continue
+            uncached = fhirpath.compile_expression.__wrapped__
+            report(
+                expression + " (parse each time)",
+                measure(
+                    lambda: [uncached(expression, resource_type)(m) for m in models],
+                    **options,
+                ),
+            )
+            report(
+                expression + " (compiled)",
+                measure(lambda: [compiled(m) for m in models], **options),
+            )
+            if fhirpathpy is not None:
+                report(
+                    expression + " (fhirpathpy)",
+                    measure(
+                        lambda: [fhirpathpy.evaluate(d, expression) for d in documents],
+                        **options,
+                    ),
+                )
+
+        expressions = [
+            expression
+            for expression in expressions
+            if _compiles(expression, resource_type)
+        ]
+        singles = [
+            fhirpath.compile_expression(expression, resource_type)
+            for expression in expressions
+        ]
+        batch = fhirpath.compile_batch(expressions, resource_type)
+        report(
+            resource_type + " (one by one)",
+            measure(lambda: [[e(m) for e in singles] for m in models], **options),
+        )
+        report(
+            resource_type + " (batch)",
+            measure(lambda: [batch(m) for m in models], **options),
+        )
+        if args.workers > 1:
+            texts = [json.dumps(document) for document in documents]
+            report(
+                resource_type + f" (parse + batch, {args.workers} processes)",
+                measure(
+                    lambda: list(
+                        fhirpath.evaluate_batch(
+                            texts, expressions, resource_type, args.workers
+                        )
+                    ),
+                    **options,
+                ),
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
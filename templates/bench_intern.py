@@ -0,0 +1,93 @@
+"""Memory held by the parsed examples with and without interning of the
+low-cardinality values (``fhirintern``), for the resource models and the
+read-only models, and the cost of the interning pass.
+
+Usage: ``python -m fhir.resources.tests.bench_intern [--repeat N] [--copies 100]``
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from .. import fhirintern, fhirlite, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def validate(document):
+    """ """
+    return get_fhir_model_class(document["resourceType"]).model_validate(document)
+
+
+def held_bytes(func, contents):
+    """Returns the memory held by the objects ``func`` parses from the JSON
+    documents, per document (every document is decoded on its own, as read
+    from a cache or a queue)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [func(content) for content in contents]
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum([stat.size_diff for stat in after.compare_to(before, "filename")])
+    del objects
+    return held / len(contents)
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    contents = list()
+    for _, content in iter_examples(args.resource_types):
+        try:
+            validate(json.loads(content))
+        except Exception:
+            continue
+        contents.append(content)
+    if not contents:
+        sys.stdout.write("No examples available\n")
+        return 1
+    contents = contents * args.copies
+    sys.stdout.write("{0} documents\n".format(len(contents)))
+
+    for name, func in (
+        ("resource models", lambda content: validate(json.loads(content))),
+        (
+            "resource models, interned",
+            lambda content: fhirintern.parse_json(content),
+        ),
+        ("read-only models", lambda content: fhirlite.loads(content)),
+        (
+            "read-only models, interned",
+            lambda content: fhirlite.decode(
+                fhirintern.intern_values(json.loads(content))
+            ),
+        ),
+    ):
+        fhirintern.TABLE.clear()
+        sys.stdout.write(
+            "{0:<48} {1:>10.0f} bytes per document\n".format(
+                name, held_bytes(func, contents)
+            )
+        )
+    sys.stdout.write("{0} interned values\n".format(len(fhirintern.TABLE)))
+
+    documents = [json.loads(content) for content in contents]
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    report(
+        "model_validate",
+        measure(lambda: [validate(document) for document in documents], **options),
+    )
+    report(
+        "intern_values + model_validate",
+        measure(
+            lambda: [fhirintern.parse(document) for document in documents], **options
+        ),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Bulk validation of the examples with and without the invariant checks,
+and the cost of the invariant checks alone on parsed models.
+
+Usage: ``python -m fhir.resources.tests.bench_invariants [--repeat N]``
+"""
+import json
+import sys
+
+from .. import fhirinvariants, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    documents = dict()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            get_fhir_model_class(document["resourceType"]).model_validate(document)
+        except Exception:
+            continue
+        documents.setdefault(document["resourceType"], list()).append(document)
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for resource_type, items in sorted(documents.items()):
+        items = items * args.copies
+        models = [
+            resource for resource, _ in fhirinvariants.validate_many(items, False)
+        ]
+        report(
+            f"{resource_type} (validation)",
+            measure(
+                lambda: list(fhirinvariants.validate_many(items, False)), **options
+            ),
+        )
+        report(
+            f"{resource_type} (validation + invariants)",
+            measure(lambda: list(fhirinvariants.validate_many(items, True)), **options),
+        )
+        report(
+            f"{resource_type} (invariants only)",
+            measure(lambda: [fhirinvariants.validate(m) for m in models], **options),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
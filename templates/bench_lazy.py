@@ -0,0 +1,107 @@
+"""The ``dateTime``, ``instant``, ``decimal`` and ``base64Binary`` values of
+the examples validated with the eager types of ``fhir_core`` and with the
+lazy types of ``fhirlazy``, and the cost of materializing them afterwards;
+then the examples validated and re-serialized with the resource models as
+generated (run it with and without ``LAZY_PRIMITIVES`` to compare).
+
+Usage: ``python -m fhir.resources.tests.bench_lazy [--repeat N] [--copies 100]``
+"""
+import json
+import sys
+import typing
+
+from fhir_core import types as fhir_types
+from pydantic import TypeAdapter
+
+from .. import fhirlazy, fhirtypes, get_fhir_model_class
+from ..fhirelements import ELEMENTS
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+TYPE_NAMES = ("DateTime", "Instant", "Decimal", "Base64Binary")
+
+
+def validate(content):
+    """ """
+    resource_type = json.loads(content)["resourceType"]
+    return get_fhir_model_class(resource_type).model_validate_json(content)
+
+
+def collect(class_name, data, values):
+    """Adds the values of the lazy types found in the JSON representation of
+    an element of the given class to ``values``, per type name."""
+    for info in ELEMENTS.get(class_name, ()):
+        value = data.get(info.json_name)
+        if value is None:
+            continue
+        for item in value if info.is_array else (value,):
+            if info.type_name in TYPE_NAMES:
+                if item is not None:
+                    values[info.type_name].append(item)
+            elif type(item) is dict:
+                collect(item.get("resourceType", info.type_name), item, values)
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    values: typing.Dict[str, typing.List[typing.Any]] = {
+        name: list() for name in TYPE_NAMES
+    }
+    for _, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        collect(document.get("resourceType"), document, values)
+    if not any(values.values()):
+        sys.stdout.write("No values available\n")
+        return 1
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for name in TYPE_NAMES:
+        if not values[name]:
+            continue
+        items = values[name] * args.copies
+        content = json.dumps(items).encode("utf-8")
+        eager = TypeAdapter(typing.List[getattr(fhir_types, name + "Type")])
+        lazy = TypeAdapter(typing.List[getattr(fhirlazy, name + "Type")])
+        sys.stdout.write("{0}: {1} values\n".format(name, len(items)))
+        report(
+            "  eager validate_json",
+            measure(lambda: eager.validate_json(content), **options),
+        )
+        report(
+            "  lazy validate_json",
+            measure(lambda: lazy.validate_json(content), **options),
+        )
+        report(
+            "  lazy validate_json + value",
+            measure(
+                lambda: [value.value for value in lazy.validate_json(content)],
+                **options,
+            ),
+        )
+
+    contents = list()
+    for _, content in iter_examples(args.resource_types):
+        try:
+            validate(content)
+        except Exception:
+            continue
+        contents.append(content)
+    contents = contents * args.copies
+    mode = "lazy" if fhirtypes.DateTimeType is fhirlazy.DateTimeType else "eager"
+    sys.stdout.write("{0} documents, {1} primitives\n".format(len(contents), mode))
+    report(
+        "model_validate_json",
+        measure(lambda: [validate(content) for content in contents], **options),
+    )
+    models = [validate(content) for content in contents]
+    report(
+        "model_dump_json",
+        measure(lambda: [model.model_dump_json() for model in models], **options),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
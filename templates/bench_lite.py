@@ -0,0 +1,111 @@
+"""Decoding the examples into the read-only models compared with validating
+them into the resource models: decode time, and memory held per decoded
+resource (``tracemalloc``).
+
+Usage: ``python -m fhir.resources.tests.bench_lite [--repeat N] [--copies 10]``
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from .. import fhirlite, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def validate(document):
+    """ """
+    return get_fhir_model_class(document["resourceType"]).model_validate(document)
+
+
+def held_bytes(func, documents):
+    """Returns the memory held by the objects ``func`` builds from the
+    documents, per document."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [func(document) for document in documents]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum([stat.size_diff for stat in after.compare_to(before, "filename")])
+    del objects
+    return held / len(documents)
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    contents = list()
+    for _, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            validate(document)
+            fhirlite.decode(document)
+        except Exception:
+            continue
+        contents.append(content)
+    if not contents:
+        sys.stdout.write("No examples available\n")
+        return 1
+    contents = contents * args.copies
+    documents = [json.loads(content) for content in contents]
+    sys.stdout.write("{0} documents\n".format(len(documents)))
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    report(
+        "model_validate (dict)",
+        measure(lambda: [validate(document) for document in documents], **options),
+    )
+    report(
+        "fhirlite.decode (dict)",
+        measure(
+            lambda: [fhirlite.decode(document) for document in documents], **options
+        ),
+    )
+    report(
+        "model_validate_json (bytes)",
+        measure(
+            lambda: [
+                get_fhir_model_class(document["resourceType"]).model_validate_json(
+                    content
+                )
+                for document, content in zip(documents, contents)
+            ],
+            **options,
+        ),
+    )
+    report(
+        "fhirlite.loads (bytes)",
+        measure(lambda: [fhirlite.loads(content) for content in contents], **options),
+    )
+    models = [validate(document) for document in documents]
+    lites = [fhirlite.decode(document) for document in documents]
+    report(
+        "model_dump_json",
+        measure(lambda: [model.model_dump_json() for model in models], **options),
+    )
+    report(
+        "fhirlite.dumps",
+        measure(lambda: [fhirlite.dumps(lite) for lite in lites], **options),
+    )
+    report(
+        "fhirlite.to_model",
+        measure(lambda: [fhirlite.to_model(lite) for lite in lites], **options),
+    )
+
+    for name, func in (
+        ("resource models", validate),
+        ("read-only models", fhirlite.decode),
+    ):
+        sys.stdout.write(
+            "{0:<48} {1:>10.0f} bytes per document\n".format(
+                name, held_bytes(func, documents)
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
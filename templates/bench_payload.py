@@ -0,0 +1,104 @@
+"""Peak memory (``tracemalloc``) and time of validating, decoding and
+re-serializing ``Binary`` resources of growing sizes: read whole and
+validated by the resource model, and with the large payloads kept out of
+the model (``fhirpayload``), in the mapped file or spilled to a temporary
+file. Needs the lazy primitives (``LAZY_PRIMITIVES``).
+
+Usage: ``python -m fhir.resources.tests.bench_payload [--repeat N] [--size 1 --size 32]``
+"""
+import base64
+import gc
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .. import fhirlazy, fhirpayload, fhirtypes
+from ..binary import Binary
+from .benchutils import parse_args
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def add_arguments(parser):
+    """ """
+    parser.add_argument(
+        "--size",
+        type=int,
+        action="append",
+        dest="sizes",
+        default=None,
+        help="Size of the payload in MiB (1, 8 and 32 by default)",
+    )
+
+
+def whole(path, target):
+    """ """
+    model = Binary.model_validate_json(pathlib.Path(path).read_bytes())
+    with open(target, "wb") as stream:
+        stream.write(model.data.value)
+    with open(target, "wb") as stream:
+        stream.write(model.model_dump_json().encode("utf-8"))
+
+
+def payload(path, target, spill_threshold=None):
+    """ """
+    model = fhirpayload.parse_file(path, spill_threshold=spill_threshold)
+    model.data.decode_to_file(target)
+    with open(target, "wb") as stream:
+        fhirpayload.dump(model, stream)
+
+
+def peak(func, *args):
+    """Returns the peak of traced memory and the time of a call."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_size, elapsed
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv, add_arguments)
+    if fhirtypes.Base64BinaryType is not fhirlazy.Base64BinaryType:
+        sys.stdout.write("Generated without LAZY_PRIMITIVES\n")
+        return 1
+    with tempfile.TemporaryDirectory() as directory:
+        target = os.path.join(directory, "out")
+        for size in args.sizes or [1, 8, 32]:
+            path = os.path.join(directory, "binary-{0}.json".format(size))
+            with open(path, "w") as stream:
+                json.dump(
+                    {
+                        "resourceType": "Binary",
+                        "contentType": "application/octet-stream",
+                        "data": base64.b64encode(os.urandom(size << 20)).decode(),
+                    },
+                    stream,
+                )
+            for name, func, extra in (
+                ("model_validate_json", whole, ()),
+                ("fhirpayload, mapped", payload, ()),
+                ("fhirpayload, spilled", payload, (0,)),
+            ):
+                results = [peak(func, path, target, *extra) for _ in range(args.repeat)]
+                sys.stdout.write(
+                    "{0:>3} MiB {1:<24} {2:>10.1f} MiB peak {3:>10.1f} ms\n".format(
+                        size,
+                        name,
+                        min([result[0] for result in results]) / (1 << 20),
+                        min([result[1] for result in results]) * 1000,
+                    )
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
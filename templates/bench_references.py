@@ -0,0 +1,73 @@
+"""Reference extraction through the generated reference index compared with
+walking every field of the resources.
+
+Usage: ``python -m fhir.resources.tests.bench_references [--repeat N]``
+"""
+import json
+import sys
+
+from fhir_core.fhirabstractmodel import FHIRAbstractModel
+
+from .. import fhirreferences, get_fhir_model_class
+from ..reference import Reference
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def walk_all_fields(node, found):
+    """The naive approach: visit every field looking for ``Reference``."""
+    if isinstance(node, Reference):
+        found.append(node)
+    elif isinstance(node, list):
+        for item in node:
+            walk_all_fields(item, found)
+    elif isinstance(node, FHIRAbstractModel):
+        for name in type(node).model_fields:
+            value = getattr(node, name)
+            if value is not None:
+                walk_all_fields(value, found)
+    return found
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    models = list()
+    documents = list()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            klass = get_fhir_model_class(document["resourceType"])
+            models.append(klass.model_validate(document))
+        except Exception:
+            continue
+        documents.append(document)
+
+    sys.stdout.write("{0} resources loaded\n".format(len(models)))
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+
+    report(
+        "naive walk (models)",
+        measure(lambda: [walk_all_fields(m, []) for m in models], **options),
+    )
+    report(
+        "reference index (models)",
+        measure(
+            lambda: [fhirreferences.extract_references(m) for m in models], **options
+        ),
+    )
+    report(
+        "reference index (json)",
+        measure(
+            lambda: [fhirreferences.extract_references(d) for d in documents],
+            **options
+        ),
+    )
+    found = sum(len(fhirreferences.extract_references(m)) for m in models)
+    sys.stdout.write("{0} references found through the index\n".format(found))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
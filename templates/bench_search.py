@@ -0,0 +1,65 @@
+"""Generated search parameter extractors compared with evaluating the same
+FHIRPath expressions with the compiled closures, and with parsing them for
+every resource.
+
+Usage: ``python -m fhir.resources.tests.bench_search [--repeat N]``
+"""
+import json
+import sys
+
+from .. import fhirpath, fhirsearch, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    resources = dict()
+    for name, content in iter_examples(args.resource_types):
+        document = json.loads(content)
+        try:
+            klass = get_fhir_model_class(document["resourceType"])
+            model = klass.model_validate(document)
+        except Exception:
+            continue
+        resources.setdefault(document["resourceType"], list()).append(model)
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    for resource_type, models in sorted(resources.items()):
+        models = models * args.copies
+        parameters = fhirsearch.search_parameters(resource_type)
+        expressions = list()
+        for parameter in parameters.values():
+            try:
+                fhirpath.compile_expression(parameter.expression, resource_type)
+            except ValueError:
+                continue
+            expressions.append(parameter.expression)
+        if not expressions:
+            continue
+        uncached = fhirpath.compile_expression.__wrapped__
+        compiled = [fhirpath.compile_expression(e, resource_type) for e in expressions]
+        report(
+            f"{resource_type} ({len(expressions)} parameters, parse each time)",
+            measure(
+                lambda: [
+                    [uncached(e, resource_type)(m) for e in expressions] for m in models
+                ],
+                **options,
+            ),
+        )
+        report(
+            f"{resource_type} (compiled FHIRPath)",
+            measure(lambda: [[c(m) for c in compiled] for m in models], **options),
+        )
+        report(
+            f"{resource_type} (generated extractors)",
+            measure(lambda: [fhirsearch.extract(m) for m in models], **options),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
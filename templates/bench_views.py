@@ -0,0 +1,101 @@
+"""Columnar flattening views compared with per object model flattening.
+
+Usage: ``python -m fhir.resources.tests.bench_views [--repeat N] [--copies 200]``
+"""
+import io
+import json
+import sys
+
+from .. import fhirviews, get_fhir_model_class
+from .benchutils import iter_examples, measure, parse_args, report
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+VIEW = fhirviews.ViewDefinition(
+    resource="Observation",
+    resource_columns=(
+        fhirviews.Column("id", "id"),
+        fhirviews.Column("status", "status"),
+        fhirviews.Column("subject", "subject.reference"),
+    ),
+    columns=(
+        fhirviews.Column("code", "code.coding.code"),
+        fhirviews.Column("value", "valueQuantity.value"),
+        fhirviews.Column("unit", "valueQuantity.unit"),
+    ),
+    for_each="component",
+    for_each_or_null=True,
+)
+BATCH_SIZES = [1, 100, 1000, 10000]
+
+
+def first(values):
+    return values[0] if values else None
+
+
+def model_rows(documents):
+    """Validates every document into its model and flattens it attribute by
+    attribute, one dict per row."""
+    klass = get_fhir_model_class("Observation")
+    rows = list()
+    for document in documents:
+        obj = klass.model_validate(document)
+        fixed = {
+            "id": obj.id,
+            "status": obj.status,
+            "subject": obj.subject.reference if obj.subject else None,
+        }
+        for component in obj.component or [None]:
+            row = dict(fixed)
+            quantity = component and component.valueQuantity
+            coding = component and component.code.coding
+            row["code"] = first([c.code for c in coding or [] if c.code])
+            row["value"] = quantity.value if quantity else None
+            row["unit"] = quantity.unit if quantity else None
+            rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+
+    documents = list()
+    for _, content in iter_examples(["Observation"]):
+        document = json.loads(content)
+        if document.get("resourceType") == "Observation":
+            documents.append(document)
+    if not documents:
+        sys.stdout.write("No Observation examples available\n")
+        return 1
+    documents = documents * args.copies
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    sys.stdout.write("{0} Observation documents\n".format(len(documents)))
+
+    report("models", measure(lambda: model_rows(documents), **options))
+    compiled = fhirviews.compile_view(VIEW)
+    for batch_size in BATCH_SIZES:
+        report(
+            "view, batch size {0}".format(batch_size),
+            measure(lambda: list(compiled.batches(documents, batch_size)), **options),
+        )
+    if fhirviews.numpy is not None:
+        report(
+            "view, NumPy columns",
+            measure(lambda: list(compiled.batches(documents, 10000, True)), **options),
+        )
+    report(
+        "view to csv",
+        measure(lambda: fhirviews.write_csv(VIEW, documents, io.StringIO()), **options),
+    )
+    report(
+        "view to columnar",
+        measure(
+            lambda: fhirviews.write_columnar(VIEW, documents, io.BytesIO()), **options
+        ),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
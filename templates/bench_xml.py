@@ -0,0 +1,98 @@
+"""Streaming XML parsing/serializing compared with tree based processing.
+
+Usage: ``python -m fhir.resources.tests.bench_xml [--repeat N]``
+"""
+import sys
+import tracemalloc
+from xml.etree.ElementTree import fromstring
+
+from .. import fhirxml
+from .benchutils import iter_examples, measure, parse_args, report
+
+try:
+    import lxml  # noqa: F401
+except ImportError:
+    lxml = None
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def peak_memory(func):
+    """Returns the peak of memory allocated while calling ``func``."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    args = parse_args(__doc__, argv)
+    documents = list()
+    models = list()
+    failures = 0
+    for name, content in iter_examples(args.resource_types, fmt="xml"):
+        try:
+            model = fhirxml.parse_xml(content)
+        except Exception:
+            failures += 1
+            continue
+        documents.append(content)
+        models.append(model)
+    if not documents:
+        sys.stdout.write("No XML examples available\n")
+        return 1
+    documents = documents * args.copies
+    models = models * args.copies
+    sys.stdout.write(
+        "{0} XML documents ({1} skipped)\n".format(len(documents), failures)
+    )
+
+    options = {"number": args.number, "repeat": args.repeat, "warmup": args.warmup}
+    report("parse: element tree", measure(lambda: [fromstring(d) for d in documents], **options))
+    report(
+        "parse: streaming to JSON",
+        measure(lambda: [fhirxml.xml_to_dict(d) for d in documents], **options),
+    )
+    report(
+        "parse: streaming to model",
+        measure(lambda: [fhirxml.parse_xml(d) for d in documents], **options),
+    )
+    if lxml is not None:
+        report(
+            "parse: model_validate_xml",
+            measure(
+                lambda: [type(m).model_validate_xml(d) for m, d in zip(models, documents)],
+                **options,
+            ),
+        )
+        report(
+            "serialize: model_dump_xml",
+            measure(lambda: [m.model_dump_xml() for m in models], **options),
+        )
+    report(
+        "serialize: streaming from model",
+        measure(lambda: [fhirxml.to_xml(m) for m in models], **options),
+    )
+
+    largest = max(documents, key=len)
+    sys.stdout.write(
+        "peak memory parsing the largest document ({0} bytes):\n".format(len(largest))
+    )
+    sys.stdout.write(
+        "  element tree             {0:>10} bytes\n".format(
+            peak_memory(lambda: fromstring(largest))
+        )
+    )
+    sys.stdout.write(
+        "  streaming to JSON        {0:>10} bytes\n".format(
+            peak_memory(lambda: fhirxml.xml_to_dict(largest))
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Helpers shared by the ``bench_*`` scripts: access to the FHIR examples
+used by the unit tests and simple timing statistics."""
+import argparse
+import gc
+import io
+import json
+import statistics
+import sys
+import time
+import typing
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from .fixtures import EXAMPLE_RESOURCES_URL, cached_archive
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def examples_archive(fmt: str = "json") -> str:
+    """Returns the location of the cached examples archive (``json`` or
+    ``xml``), downloads it (same as ``base_settings`` fixture) if it is
+    missing."""
+    url = EXAMPLE_RESOURCES_URL
+    if fmt != "json":
+        url = url.replace("-examples-json.zip", f"-examples-{fmt}.zip")
+    return cached_archive(url)
+
+
+def _resource_type(content: bytes, fmt: str) -> typing.Optional[str]:
+    """ """
+    if fmt == "json":
+        try:
+            return json.loads(content).get("resourceType")
+        except ValueError:
+            return None
+    for _, elem in iterparse(io.BytesIO(content), events=("start",)):
+        return elem.tag.rpartition("}")[2]
+    return None
+
+
+def iter_examples(
+    resource_types: typing.Optional[typing.Collection[str]] = None,
+    fmt: str = "json",
+) -> typing.Iterator[typing.Tuple[str, bytes]]:
+    """Yields ``(name, content)`` of the examples (``json`` or ``xml``),
+    optionally only those of the given resource types. Members are read
+    directly from the archive.
+    """
+    with zipfile.ZipFile(examples_archive(fmt)) as z:
+        for name in sorted(z.namelist()):
+            if not name.endswith("." + fmt):
+                continue
+            content = z.read(name)
+            if resource_types is not None:
+                if _resource_type(content, fmt) not in resource_types:
+                    continue
+            yield name, content
+
+
+def measure(
+    func: typing.Callable[[], typing.Any],
+    number: int = 1,
+    repeat: int = 5,
+    warmup: int = 1,
+) -> typing.Dict[str, float]:
+    """Times ``func`` called ``number`` times per round, for ``repeat``
+    rounds after ``warmup`` rounds, and returns the per call statistics
+    in seconds."""
+    for _ in range(warmup):
+        for _ in range(number):
+            func()
+    timings = list()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            timings.append((time.perf_counter() - start) / number)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return {
+        "min": min(timings),
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def report(name: str, stats: typing.Dict[str, float], stream=None):
+    """Writes one human readable line for the given statistics."""
+    stream = stream or sys.stdout
+    stream.write(
+        "{0:<48} min {1:>10.3f} ms  median {2:>10.3f} ms  "
+        "stdev {3:>8.3f} ms\n".format(
+            name, stats["min"] * 1e3, stats["median"] * 1e3, stats["stdev"] * 1e3
+        )
+    )
+
+
+def parse_args(
+    description: str,
+    argv=None,
+    add_arguments: typing.Optional[typing.Callable[[argparse.ArgumentParser], None]] = None,
+) -> argparse.Namespace:
+    """Common command line options of the benchmark scripts, ``add_arguments``
+    could add the script's own options."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--number", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--copies",
+        type=int,
+        default=1,
+        help="Repeat the example documents the given number of times",
+    )
+    parser.add_argument(
+        "--resource-type",
+        action="append",
+        dest="resource_types",
+        default=None,
+        help="Limit to the given resource type(s)",
+    )
+    if add_arguments is not None:
+        add_arguments(parser)
+    return parser.parse_args(argv)
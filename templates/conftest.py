@@ -1 +1,4 @@
 from .fixtures import *  # noqa: F403
+
+# shared with the tests of the previous releases, registered once per session
+pytest_plugins = ["fhir.resources.tests.sharding"]
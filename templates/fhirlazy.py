@@ -0,0 +1,354 @@
+"""Lazily materialized primitives
+
+With ``LAZY_PRIMITIVES`` the ``dateTime``, ``instant``, ``decimal`` and
+``base64Binary`` types of ``fhirtypes`` are the ones of this module: their
+values are only checked against the lexical pattern of the type and kept as
+given, a ``str`` (date/times, base64) or a number (decimals). ``value``
+converts to ``datetime``/``Decimal``/``bytes``, the same values as the eager
+types of ``fhir_core``, on first access and caches the result. Serializing
+emits the original lexical form of the date/times and base64 values, e.g.
+``2017-01-01T00:00:00.000Z`` stays as it is.
+
+Decimals are not kept as text: the JSON numbers reach the validator as
+``float`` (or ``int``), so serializing emits the shortest form of that
+float, ``1.50`` becomes ``1.5`` and digits beyond the precision of a float
+(about 17 significant digits) are lost, ``value`` is the ``Decimal`` of that
+float too. Only decimals given as text (i.e ``"1.50"`` in python) keep it.
+
+Values that only fail the conversion (e.g. ``2021-02-30``) are accepted and
+raise on access of ``value``.
+"""
+
+from __future__ import annotations as _annotations
+
+import base64
+import binascii
+import contextvars
+import datetime
+import decimal
+import math
+import re
+import typing
+from functools import cached_property, lru_cache
+
+from fhir_core import types as fhir_types
+from fhir_core.constraints import FHIR_PRIMITIVES_MAPS
+from pydantic import TypeAdapter
+from pydantic.types import Base64Encoder
+from pydantic_core import core_schema
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+BASE64_PATTERN = re.compile(r"[A-Za-z0-9+/\s]*(=\s*){0,2}")
+# base64 without whitespace, the usual form, is checked with
+# bytes.translate which is much faster than the pattern for large values
+BASE64_ALPHABET = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+# decimals written without fraction and exponent are kept as int, like the
+# eager type serializes them
+INTEGER_PATTERN = re.compile(r"-?(0|[1-9][0-9]*)")
+
+# placeholder: payload, the large base64Binary values ``fhirpayload`` keeps
+# out of the JSON being validated
+PAYLOAD_PLACEHOLDERS: contextvars.ContextVar[
+    typing.Optional[typing.Dict[str, LazyPrimitive]]
+] = contextvars.ContextVar("PAYLOAD_PLACEHOLDERS", default=None)
+
+
+@lru_cache(maxsize=None)
+def _adapter(eager_type: typing.Any) -> TypeAdapter:
+    """ """
+    return TypeAdapter(eager_type)
+
+
+class LazyPrimitive:
+    """Mixin of the lazy values: the validated lexical form, converted on
+    first access of ``value``."""
+
+    __slots__ = ()
+    __eager_type__: typing.ClassVar[typing.Any] = None
+
+    @cached_property
+    def lexical(self) -> str:
+        """The lexical form of the value, as validated."""
+        return str(self)
+
+    @cached_property
+    def value(self) -> typing.Any:
+        """The converted value (``datetime``, ``Decimal``, ``bytes``...)."""
+        try:
+            return self.convert()
+        except ValueError:
+            # the eager type raises its own error
+            return _adapter(self.__eager_type__).validate_python(self.lexical)
+
+    def convert(self) -> typing.Any:
+        """Converts the lexical form, the eager type of ``fhir_core`` is
+        used for what the fast paths don't cover."""
+        return _adapter(self.__eager_type__).validate_python(self.lexical)
+
+
+class LazyDateTime(LazyPrimitive, str):
+    """A ``dateTime`` kept as text; ``value`` is a ``datetime``, a ``date``
+    or, for partial dates, the text."""
+
+    __eager_type__ = fhir_types.DateTimeType
+
+    def convert(self) -> typing.Any:
+        """ """
+        if len(self) < 10:
+            return str(self)
+        if len(self) == 10:
+            return datetime.date.fromisoformat(self)
+        return datetime.datetime.fromisoformat(self)
+
+
+class LazyInstant(LazyPrimitive, str):
+    """An ``instant`` kept as text; ``value`` is a ``datetime``."""
+
+    __eager_type__ = fhir_types.InstantType
+
+    def convert(self) -> typing.Any:
+        """ """
+        return datetime.datetime.fromisoformat(self)
+
+
+class LazyBase64Binary(LazyPrimitive, str):
+    """A ``base64Binary`` kept encoded; ``value`` is the decoded ``bytes``."""
+
+    __eager_type__ = fhir_types.Base64BinaryType
+
+    def convert(self) -> typing.Any:
+        """ """
+        try:
+            return base64.b64decode(self)
+        except binascii.Error as exc:
+            raise ValueError(str(exc))
+
+
+class LazyDecimal(LazyPrimitive, float):
+    """A ``decimal`` with a fraction or an exponent, kept as a float (the
+    lexical form of a JSON number is not preserved, see above); ``value`` is
+    a ``Decimal``."""
+
+    __eager_type__ = fhir_types.DecimalType
+
+    @cached_property
+    def lexical(self) -> str:
+        """ """
+        return repr(float(self))
+
+    def convert(self) -> typing.Any:
+        """ """
+        return decimal.Decimal(self.lexical)
+
+
+class LazyDecimalInteger(LazyPrimitive, int):
+    """A ``decimal`` without fraction and exponent, kept as a number;
+    ``value`` is a ``Decimal``."""
+
+    __eager_type__ = fhir_types.DecimalType
+
+    @cached_property
+    def lexical(self) -> str:
+        """ """
+        return str(int(self))
+
+    def convert(self) -> typing.Any:
+        """ """
+        return decimal.Decimal(self.lexical)
+
+
+def _materialized(lazy: LazyPrimitive, value: typing.Any) -> LazyPrimitive:
+    """Returns the lazy value with its converted value already cached."""
+    lazy.__dict__["value"] = value
+    return lazy
+
+
+class LazyType:
+    """Base class of the annotations of the lazy types: validates the input
+    into a lazy value. Inputs which are not text (``datetime``, ``bytes``...)
+    are converted eagerly."""
+
+    __slots__ = ()
+    __visit_name__: typing.ClassVar[str] = ""
+    pattern: typing.ClassVar[typing.Pattern[str]]
+    lazy_class: typing.ClassVar[typing.Type[LazyPrimitive]]
+
+    @classmethod
+    def validate(cls, input_value: typing.Any) -> LazyPrimitive:
+        """ """
+        if isinstance(input_value, cls.lazy_class):
+            return input_value
+        if isinstance(input_value, str):
+            if not cls.pattern.fullmatch(input_value):
+                raise ValueError(
+                    f"{cls.__visit_name__} value string does not match spec regex."
+                )
+            return cls.lazy_class(input_value)
+        value = _adapter(cls.lazy_class.__eager_type__).validate_python(input_value)
+        return _materialized(cls.lazy_class(cls.lexical(value)), value)
+
+    @classmethod
+    def lexical(cls, value: typing.Any) -> str:
+        """Returns the lexical form of a converted value."""
+        return value.isoformat()
+
+    def __get_pydantic_core_schema__(
+        self, source_type: typing.Any, handler: typing.Any
+    ) -> core_schema.CoreSchema:
+        """ """
+        return core_schema.no_info_plain_validator_function(
+            self.validate, json_schema_input_schema=core_schema.str_schema()
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.__class__)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        return type(other) is type(self)
+
+
+class DateTime(LazyType):
+    """ """
+
+    __visit_name__ = "dateTime"
+    pattern = fhir_types.DateTime.pattern
+    lazy_class = LazyDateTime
+
+
+class Instant(LazyType):
+    """ """
+
+    __visit_name__ = "instant"
+    pattern = fhir_types.Instant.pattern
+    lazy_class = LazyInstant
+
+
+def _is_compact_base64(value: str) -> bool:
+    """ """
+    if not value.isascii():
+        return False
+    data = value.encode("ascii")
+    unpadded = data.rstrip(b"=")
+    return len(data) - len(unpadded) <= 2 and not unpadded.translate(
+        None, BASE64_ALPHABET
+    )
+
+
+class Base64Binary(LazyType):
+    """ """
+
+    __visit_name__ = "base64Binary"
+    pattern = BASE64_PATTERN
+    lazy_class = LazyBase64Binary
+
+    @classmethod
+    def validate(cls, input_value: typing.Any) -> LazyPrimitive:
+        """ """
+        if isinstance(input_value, LazyPrimitive):
+            # i.e the large payloads of ``fhirpayload``
+            if input_value.__eager_type__ is fhir_types.Base64BinaryType:
+                return input_value
+        elif isinstance(input_value, str):
+            placeholders = PAYLOAD_PLACEHOLDERS.get()
+            if placeholders and input_value in placeholders:
+                return placeholders.pop(input_value)
+            if _is_compact_base64(input_value):
+                size = len(input_value)
+            elif cls.pattern.fullmatch(input_value):
+                size = len("".join(input_value.split()))
+            else:
+                raise ValueError("base64Binary value has invalid characters.")
+            if size % 4:
+                raise ValueError("base64Binary value has an incorrect padding.")
+            return LazyBase64Binary(input_value)
+        return super().validate(input_value)
+
+    @classmethod
+    def lexical(cls, value: typing.Any) -> str:
+        """ """
+        return Base64Encoder.encode(value).decode("ascii")
+
+
+class Decimal(LazyType):
+    """ """
+
+    __visit_name__ = "decimal"
+    pattern = fhir_types.Decimal.pattern
+
+    @classmethod
+    def validate(cls, input_value: typing.Any) -> LazyPrimitive:
+        """ """
+        if isinstance(input_value, (LazyDecimal, LazyDecimalInteger)):
+            return input_value
+        if type(input_value) is int:
+            return LazyDecimalInteger(input_value)
+        if type(input_value) is float:
+            # every finite float is written as a valid decimal
+            if not math.isfinite(input_value):
+                raise ValueError("Decimal value must be finite.")
+            return LazyDecimal(input_value)
+        if isinstance(input_value, (float, int)) and not isinstance(input_value, bool):
+            text = repr(input_value)
+        elif isinstance(input_value, str):
+            text = input_value
+        else:
+            value = _adapter(fhir_types.DecimalType).validate_python(input_value)
+            text = str(value)
+        if not cls.pattern.fullmatch(text):
+            raise ValueError("Decimal value string does not match spec regex.")
+        if INTEGER_PATTERN.fullmatch(text):
+            lazy: LazyPrimitive = LazyDecimalInteger(text)
+        else:
+            lazy = LazyDecimal(text)
+        if not isinstance(input_value, (float, int)):
+            # keeps the precision of the text, e.g. 1.50
+            lazy.__dict__["lexical"] = text
+        return lazy
+
+    def __get_pydantic_core_schema__(
+        self, source_type: typing.Any, handler: typing.Any
+    ) -> core_schema.CoreSchema:
+        """ """
+        return core_schema.no_info_plain_validator_function(
+            self.validate, json_schema_input_schema=core_schema.float_schema()
+        )
+
+
+def materialize(value: typing.Any) -> typing.Any:
+    """Returns the converted value of a lazy value, any other value as is."""
+    if isinstance(value, LazyPrimitive):
+        return value.value
+    return value
+
+
+DateTimeType = typing.Annotated[str, DateTime()]
+FHIR_PRIMITIVES_MAPS[DateTimeType] = "dateTime"
+FHIR_PRIMITIVES_MAPS[DateTime] = "dateTime"
+
+InstantType = typing.Annotated[str, Instant()]
+FHIR_PRIMITIVES_MAPS[InstantType] = "instant"
+FHIR_PRIMITIVES_MAPS[Instant] = "instant"
+
+Base64BinaryType = typing.Annotated[str, Base64Binary()]
+FHIR_PRIMITIVES_MAPS[Base64BinaryType] = "base64Binary"
+FHIR_PRIMITIVES_MAPS[Base64Binary] = "base64Binary"
+
+DecimalType = typing.Annotated[float, Decimal()]
+FHIR_PRIMITIVES_MAPS[DecimalType] = "decimal"
+FHIR_PRIMITIVES_MAPS[Decimal] = "decimal"
+
+__all__ = [
+    "LazyPrimitive",
+    "LazyDateTime",
+    "LazyInstant",
+    "LazyBase64Binary",
+    "LazyDecimal",
+    "LazyDecimalInteger",
+    "materialize",
+    "DateTimeType",
+    "InstantType",
+    "Base64BinaryType",
+    "DecimalType",
+]
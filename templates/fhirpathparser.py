@@ -0,0 +1,262 @@
+"""FHIRPath tokenizer and parser (grammar of ``FHIRPathExpression.g4``). The
+syntax tree is made of tuples, it is lowered by the ``fhirpath`` module and
+translated to Python source by the generator for the search parameters."""
+import decimal
+import re
+import typing
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+Node = typing.Tuple[typing.Any, ...]
+
+_TOKENS = re.compile(
+    r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+    |(?P<datetime>@T?[0-9][0-9:.+\-TZ]*)
+    |(?P<number>[0-9]+(?:\.[0-9]+)?)
+    |(?P<string>'(?:[^'\\]|\\.)*')
+    |(?P<delimited>`(?:[^`\\]|\\.)*`)
+    |(?P<special>\$(?:this|index|total))
+    |(?P<constant>%(?:[A-Za-z_][A-Za-z0-9_\-]*|'(?:[^'\\]|\\.)*'|`(?:[^`\\]|\\.)*`))
+    |(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<operator><=|>=|!=|!~|[-+*/&|=~<>()\[\]{},.])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+_ESCAPES = {"n": "\n", "r": "\r", "t": "\t", "f": "\f"}
+
+# binding power of the binary operators, lowest first (``expression`` rule)
+_BINARY = {
+    "implies": 1,
+    "or": 2,
+    "xor": 2,
+    "and": 3,
+    "in": 4,
+    "contains": 4,
+    "=": 5,
+    "~": 5,
+    "!=": 5,
+    "!~": 5,
+    "<": 6,
+    "<=": 6,
+    ">": 6,
+    ">=": 6,
+    "|": 7,
+    "is": 8,
+    "as": 8,
+    "+": 9,
+    "-": 9,
+    "&": 9,
+    "*": 10,
+    "/": 10,
+    "div": 10,
+    "mod": 10,
+}
+
+
+class Token(typing.NamedTuple):
+    kind: str
+    value: str
+    position: int
+
+
+def _unquote(text: str) -> str:
+    """ """
+    return re.sub(
+        r"\\(u[0-9a-fA-F]{4}|.)",
+        lambda m: (
+            chr(int(m.group(1)[1:], 16))
+            if len(m.group(1)) == 5
+            else _ESCAPES.get(m.group(1), m.group(1))
+        ),
+        text[1:-1],
+    )
+
+
+def tokenize(expression: str) -> typing.List[Token]:
+    """Splits an expression into tokens, whitespace and comments dropped."""
+    tokens = list()
+    position = 0
+    while position < len(expression):
+        match = _TOKENS.match(expression, position)
+        if match is None:
+            raise ValueError(
+                f"Unexpected character {expression[position]!r} at {position} "
+                f"in FHIRPath expression '{expression}'"
+            )
+        if match.lastgroup != "space":
+            tokens.append(Token(match.lastgroup, match.group(), position))
+        position = match.end()
+    tokens.append(Token("end", "", position))
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser of the ``FHIRPathExpression.g4`` grammar,
+    the syntax tree is made of tuples ``(kind, *children)``."""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def error(self, message: str) -> ValueError:
+        token = self.tokens[self.position]
+        return ValueError(
+            f"{message} at {token.position} in FHIRPath expression "
+            f"'{self.expression}'"
+        )
+
+    def peek(self) -> Token:
+        return self.tokens[self.position]
+
+    def advance(self) -> Token:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, value: str) -> bool:
+        token = self.tokens[self.position]
+        if token.kind in ("operator", "identifier") and token.value == value:
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, value: str):
+        if not self.accept(value):
+            raise self.error(f"Expected '{value}'")
+
+    def parse(self) -> Node:
+        node = self.expression_(0)
+        if self.peek().kind != "end":
+            raise self.error(f"Unexpected '{self.peek().value}'")
+        return node
+
+    def expression_(self, min_power: int) -> Node:
+        left = self.unary()
+        while True:
+            token = self.peek()
+            if token.kind not in ("operator", "identifier"):
+                break
+            power = _BINARY.get(token.value)
+            if power is None or power <= min_power:
+                break
+            self.advance()
+            if token.value in ("is", "as"):
+                left = ("type", token.value, left, self.type_specifier())
+            else:
+                left = ("binary", token.value, left, self.expression_(power))
+        return left
+
+    def unary(self) -> Node:
+        token = self.peek()
+        if token.kind == "operator" and token.value in ("+", "-"):
+            self.advance()
+            operand = self.unary()
+            if token.value == "+":
+                return operand
+            if operand[0] == "literal" and isinstance(
+                operand[1], (int, decimal.Decimal)
+            ):
+                return ("literal", -operand[1])
+            return ("negate", operand)
+        node = self.term()
+        while True:
+            if self.accept("."):
+                node = ("invoke", node, self.invocation())
+            elif self.accept("["):
+                index = self.expression_(0)
+                self.expect("]")
+                node = ("indexer", node, index)
+            else:
+                return node
+
+    def term(self) -> Node:
+        token = self.advance()
+        if token.kind == "operator":
+            if token.value == "(":
+                node = self.expression_(0)
+                self.expect(")")
+                return node
+            if token.value == "{":
+                self.expect("}")
+                return ("empty",)
+        elif token.kind == "number":
+            if self.peek().kind == "string":
+                raise self.error("Quantity literals are not supported")
+            if "." in token.value:
+                return ("literal", decimal.Decimal(token.value))
+            return ("literal", int(token.value))
+        elif token.kind == "string":
+            return ("literal", _unquote(token.value))
+        elif token.kind == "datetime":
+            return (
+                "literal",
+                token.value[2:] if token.value[1] == "T" else token.value[1:],
+            )
+        elif token.kind == "special":
+            return (token.value[1:],)
+        elif token.kind == "constant":
+            name = token.value[1:]
+            if name[0] in "'`":
+                name = _unquote(name)
+            return ("constant", name)
+        elif token.kind == "identifier" and token.value in ("true", "false"):
+            return ("literal", token.value == "true")
+        elif token.kind in ("identifier", "delimited"):
+            self.position -= 1
+            return self.invocation()
+        self.position -= 1
+        raise self.error(f"Unexpected '{token.value}'")
+
+    def identifier(self) -> str:
+        token = self.advance()
+        if token.kind == "identifier":
+            return token.value
+        if token.kind == "delimited":
+            return _unquote(token.value)
+        self.position -= 1
+        raise self.error("Expected an identifier")
+
+    def invocation(self) -> Node:
+        if self.peek().kind == "special":
+            return (self.advance().value[1:],)
+        name = self.identifier()
+        if not self.accept("("):
+            return ("member", name)
+        arguments = list()
+        if not self.accept(")"):
+            arguments.append(self.expression_(0))
+            while self.accept(","):
+                arguments.append(self.expression_(0))
+            self.expect(")")
+        return ("function", name, tuple(arguments))
+
+    def type_specifier(self) -> str:
+        name = self.identifier()
+        if name in ("FHIR", "System") and self.accept("."):
+            name = self.identifier()
+        return name
+
+
+def parse(expression: str) -> Node:
+    """Returns the syntax tree of an expression, raises ValueError if the
+    expression is not valid."""
+    return Parser(expression).parse()
+
+
+def type_specifier(node: Node) -> str:
+    """Returns the type name given as function argument (``ofType(Quantity)``,
+    ``ofType(FHIR.Quantity)``)."""
+    if node[0] == "member":
+        return node[1]
+    if (
+        node[0] == "invoke"
+        and node[1][0] == "member"
+        and node[1][1] in ("FHIR", "System")
+        and node[2][0] == "member"
+    ):
+        return node[2][1]
+    raise ValueError("Expected a type name")
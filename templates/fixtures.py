@@ -1,13 +1,16 @@
+import contextlib
 import decimal
 import hashlib
 import io
+import json
 import os
 import pathlib
-import shutil
+import re
 import sys
-import tempfile
+import time
 import typing
 import zipfile
+from functools import lru_cache
 from os.path import dirname
 
 import pytest
@@ -22,6 +25,8 @@ from fhir_core.types import (
 )
 from pydantic import BaseModel, Field
 
+from ..fhirlazy import materialize
+
 EXAMPLE_RESOURCES_URL = (
     "https://github.com/nazrulworld/hl7-archives/raw/"
     "0.4.0/FHIR/{{release}}/"
@@ -61,41 +66,83 @@ def expand(self, local):
         z.extractall(self.cache)
 
 
-@pytest.fixture(scope="session")
-def base_settings():
-    if not os.path.exists(CACHE_PATH):
-        os.makedirs(CACHE_PATH)
+if os.name == "nt":
+    import msvcrt
 
-    settings = {}
+    def _try_lock(handle):
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
 
-    example_data_file_uri = EXAMPLE_RESOURCES_URL
+    def _unlock(handle):
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
 
-    example_data_file_id = hashlib.md5(example_data_file_uri.encode()).hexdigest()
+else:
+    import fcntl
 
-    example_data_file_location = os.path.join(
-        CACHE_PATH, (example_data_file_id + ".zip")
-    )
+    def _try_lock(handle):
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
 
-    if not os.path.exists(example_data_file_location):
-        download_and_store(example_data_file_uri, example_data_file_location)
+    def _unlock(handle):
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
 
-    temp_data_dir = tempfile.mkdtemp()
-    # extract all files from archive and put into temp dir
-    with zipfile.ZipFile(example_data_file_location) as z:
-        z.extractall(temp_data_dir)
 
-    zip_dir_name = pathlib.Path(EXAMPLE_RESOURCES_URL).name[:-4]
-    if "FHIR_UNITTEST_DATADIR" not in os.environ:
-        os.environ.setdefault(
-            "FHIR_UNITTEST_DATADIR", os.path.join(temp_data_dir, zip_dir_name)
-        )
+@contextlib.contextmanager
+def file_lock(path, timeout=600):
+    """Lock shared between processes (i.e pytest-xdist workers), an advisory
+    lock of the lock file: the system releases it when the process holding
+    it ends, even killed, the file itself is left in place."""
+    start = time.monotonic()
+    with open(path, "a+b") as handle:
+        while True:
+            try:
+                _try_lock(handle)
+                break
+            except OSError:
+                if time.monotonic() - start > timeout:
+                    raise TimeoutError("Could not acquire {0}".format(path))
+                time.sleep(0.1)
+        try:
+            yield
+        finally:
+            _unlock(handle)
 
-    settings["unittest_data_dir"] = pathlib.Path(os.environ["FHIR_UNITTEST_DATADIR"])
 
-    yield settings
+def cached_archive(url):
+    """Returns the location of the archive downloaded from ``url`` in
+    ``CACHE_PATH``, downloads it once if it is missing."""
+    if not os.path.exists(CACHE_PATH):
+        os.makedirs(CACHE_PATH, exist_ok=True)
+    file_id = hashlib.md5(url.encode()).hexdigest()
+    location = os.path.join(CACHE_PATH, (file_id + ".zip"))
+    if not os.path.exists(location):
+        with file_lock(location + ".lock"):
+            if not os.path.exists(location):
+                download_and_store(url, location + ".part")
+                os.replace(location + ".part", location)
+    return location
 
-    os.environ.pop("FHIR_UNITTEST_DATADIR")
-    shutil.rmtree(temp_data_dir)
+
+@pytest.fixture(scope="session")
+def base_settings():
+    """``unittest_data_dir`` is the examples directory inside the cached
+    archive (``zipfile.Path``), members are read from the archive through its
+    in-memory name index, nothing is extracted. ``FHIR_UNITTEST_DATADIR``
+    environment variable could point to an already extracted directory."""
+    settings = {}
+
+    if "FHIR_UNITTEST_DATADIR" in os.environ:
+        settings["unittest_data_dir"] = pathlib.Path(
+            os.environ["FHIR_UNITTEST_DATADIR"]
+        )
+        yield settings
+        return
+
+    example_data_file_location = cached_archive(EXAMPLE_RESOURCES_URL)
+    zip_dir_name = pathlib.Path(EXAMPLE_RESOURCES_URL).name[:-4]
+    with zipfile.ZipFile(example_data_file_location) as z:
+        settings["unittest_data_dir"] = zipfile.Path(z, zip_dir_name + "/")
+        yield settings
 
 
 def bytes_validator(v: typing.Any) -> typing.Union[bytes]:
@@ -121,3 +168,66 @@ class ExternalValidatorModel(BaseModel):
     valueUri: UriType = Field(None, title="Uri")
     valueUrl: UrlType = Field(None, title="Url")
     valueBase64Binary: Base64BinaryType = Field(None, title="Base64Binary")
+
+
+_PATH_PARTS = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+
+
+def resolve_path(inst, path):
+    """Returns the value at an unit test path, i.e ``code.coding[0].code``."""
+    value = inst
+    for name, index in _PATH_PARTS.findall(path):
+        value = value[int(index)] if index else getattr(value, name)
+    return value
+
+
+@lru_cache(maxsize=None)
+def load_assertions(filename):
+    """Returns the generated assertion table of a test module: per example,
+    a list of ``[path, kind, expected value]``."""
+    with io.open(os.path.join(dirname(__file__), filename), "rb") as fp:
+        return json.load(fp)
+
+
+def check_assertions(inst, assertions):
+    """ """
+    for path, kind, expected in assertions:
+        value = materialize(resolve_path(inst, path))
+        if kind == "str" or kind == "int":
+            assert value == expected, path
+        elif kind == "decimal":
+            assert float(value) == float(expected), path
+        elif kind == "bool":
+            assert value is expected, path
+        else:
+            name = "value" + kind
+            external = ExternalValidatorModel.model_validate({name: expected})
+            assert value == getattr(external, name), path
+
+
+def check_example(base_settings, klass, filename, assertions_file, index):
+    """Validates the example file, checks its values, then does the same
+    with the model created again from its own data."""
+    resource_type = klass.get_resource_type()
+    path = base_settings["unittest_data_dir"] / filename
+    inst = klass.model_validate_json(path.read_bytes())
+    assert resource_type == inst.get_resource_type()
+
+    assertions = load_assertions(assertions_file)[index]
+    check_assertions(inst, assertions)
+
+    # testing reverse by generating data from itself and create again.
+    data = inst.model_dump()
+    assert resource_type == data["resourceType"]
+
+    inst2 = klass(**data)
+    check_assertions(inst2, assertions)
+
+
+def example_params(examples):
+    """Returns the test parameters of ``(example file, file size)`` items, the
+    size is kept as ``cost`` marker (used by ``--example-shard``)."""
+    return [
+        pytest.param(index, id=filename, marks=pytest.mark.cost(size))
+        for index, (filename, size) in enumerate(examples)
+    ]
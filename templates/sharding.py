@@ -0,0 +1,45 @@
+"""pytest plugin of the ``--example-shard`` option: runs one of N shards of
+the example tests, balanced by the ``cost`` marker (example file size). The
+test packages of all the releases use this module, so that the option and
+the hooks are registered once in a session running several of them."""
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--example-shard",
+        default=None,
+        help="K/N, run the K-th (1 based) of N shards of the example tests, "
+        "balanced by example file size",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "cost(size): example file size, used to balance shards"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    shard = config.getoption("--example-shard")
+    if not shard:
+        return
+    number, count = [int(value) for value in shard.split("/")]
+    loads = [0] * count
+    selected, deselected = list(), list()
+    # largest first, each one to the least loaded shard
+    costed = [(item.get_closest_marker("cost"), item) for item in items]
+    costed.sort(key=lambda pair: -(pair[0].args[0] if pair[0] else 1))
+    for marker, item in costed:
+        bucket = loads.index(min(loads))
+        loads[bucket] += marker.args[0] if marker else 1
+        if bucket == number - 1:
+            selected.append(item)
+        else:
+            deselected.append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        selected_ids = set(map(id, selected))
+        items[:] = [item for item in items if id(item) in selected_ids]
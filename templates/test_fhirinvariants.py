@@ -0,0 +1,32 @@
+"""Tests of the invariant checkers (``fhirinvariants``) on the extensions of
+the primitives."""
+from ..fhirinvariants import validate
+from ..patient import Patient
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def violations(data):
+    """ """
+    resource = Patient.model_validate(dict(data, resourceType="Patient"))
+    return [(found.path, found.invariant.key) for found in validate(resource)]
+
+
+def test_primitive_with_value_and_id():
+    """The element has a value, ele-1 holds whatever its id."""
+    assert ("Patient._gender", "ele-1") not in violations(
+        {"gender": "male", "_gender": {"id": "g"}}
+    )
+
+
+def test_primitive_with_id_only():
+    """No value and no child but the id, ele-1 fails."""
+    assert ("Patient._gender", "ele-1") in violations({"_gender": {"id": "g"}})
+
+
+def test_extensions_of_primitive_with_value():
+    """The extensions of a primitive with a value are still checked."""
+    assert ("Patient._gender.extension[0]", "ext-1") in violations(
+        {"gender": "male", "_gender": {"extension": [{"url": "http://example.org"}]}}
+    )
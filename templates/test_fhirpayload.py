@@ -0,0 +1,55 @@
+"""Tests of ``fhirpayload.parse_file``: the files are mapped in memory, with
+or without large payloads. Needs the lazy primitives (``LAZY_PRIMITIVES``)."""
+import base64
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from .. import fhirlazy, fhirpayload, fhirtypes
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+pytestmark = pytest.mark.skipif(
+    fhirtypes.Base64BinaryType is not fhirlazy.Base64BinaryType,
+    reason="Generated without LAZY_PRIMITIVES",
+)
+
+
+def write(path, data):
+    """ """
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return path
+
+
+def test_parse_file_with_payload(tmp_path):
+    """ """
+    data = base64.b64encode(bytes(range(256)) * 512).decode("ascii")
+    path = write(
+        tmp_path / "binary.json",
+        {"resourceType": "Binary", "contentType": "application/pdf", "data": data},
+    )
+    model = fhirpayload.parse_file(path, threshold=1024)
+    assert isinstance(model.data, fhirpayload.Payload)
+    assert model.data.lexical == data
+
+
+def test_parse_file_without_payload(tmp_path):
+    """No value above the threshold, the mapped file is validated as is."""
+    path = write(tmp_path / "patient.json", {"resourceType": "Patient", "id": "p1"})
+    model = fhirpayload.parse_file(path)
+    assert model.get_resource_type() == "Patient"
+    assert model.id == "p1"
+
+
+def test_parse_file_invalid(tmp_path):
+    """The document fails validation once its payloads are replaced, the
+    model reports the error of the mapped file."""
+    data = base64.b64encode(b"x" * 4096).decode("ascii")
+    path = write(
+        tmp_path / "binary.json",
+        {"resourceType": "Binary", "data": data, "unknown": True},
+    )
+    with pytest.raises(ValidationError):
+        fhirpayload.parse_file(path, threshold=1024)
@@ -0,0 +1,28 @@
+"""Tests of the column types of the flattening views (``fhirviews``)."""
+from ..fhirviews import INTEGER, ViewDefinition, compile_view
+
+__author__ = "Md Nazrul Islam"
+__email__ = "email2nazrul@gmail.com"
+
+
+def test_integer_column_of_json_strings():
+    """integer64 values are JSON strings (``Attachment.size`` of R5), they
+    go to integer columns like the other integers."""
+    view = compile_view(
+        ViewDefinition.from_dict(
+            {
+                "resource": "Patient",
+                "select": [
+                    {"forEach": "photo", "column": [{"name": "size", "path": "size"}]}
+                ],
+            }
+        )
+    )
+    resource = {
+        "resourceType": "Patient",
+        "photo": [{"size": "1234"}, {"size": 56}, {"contentType": "image/png"}],
+    }
+    (batch,) = list(view.batches([resource]))
+    assert batch[0].type_code == INTEGER
+    assert list(batch[0].values) == [1234, 56, 0]
+    assert list(batch[0].valid) == [1, 1, 0]
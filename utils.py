@@ -7,6 +7,7 @@ from subprocess import check_call, CalledProcessError
 
 from fhirspec import FHIRSpecWriter
 
+import fhiranalysis
 import fhirrenderer
 
 __author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
@@ -120,7 +121,10 @@ def update_pytest_fixture(settings):
     ) as fp:
         fp.write(
             "# -*- coding: utf-8 _*_\n"
-            f"pytest_plugins = ['fhir.resources.{settings.CURRENT_RELEASE_NAME}.tests.fixtures']\n"
+            "pytest_plugins = [\n"
+            f"    'fhir.resources.{settings.CURRENT_RELEASE_NAME}.tests.fixtures',\n"
+            "    'fhir.resources.tests.sharding',\n"
+            "]\n"
         )
 
 
@@ -158,23 +162,57 @@ def parse_path(path_str: str) -> pathlib.Path:
 
 
 class ResourceWriter(FHIRSpecWriter):
-    def write(self):
-        """ """
+    def analyze(self) -> fhiranalysis.ReleaseIR:
+        """Returns the analysis of the specification, from the cache file
+        when set and up to date."""
+        cache_file = getattr(self.settings, "ANALYSIS_CACHE_FILE", None)
+        if cache_file:
+            analysis = fhiranalysis.load(cache_file, self.spec, self.settings)
+            if analysis is not None:
+                return analysis
+        analysis = fhiranalysis.analyze(self.spec, self.settings)
+        if cache_file:
+            fhiranalysis.save(analysis, cache_file)
+        return analysis
+
+    def renderers(
+        self, analysis: fhiranalysis.ReleaseIR
+    ) -> typing.List[fhirrenderer.FHIRRenderer]:
+        """Returns the renderers enabled by the settings, in writing order."""
+        classes = list()
         if self.settings.WRITE_RESOURCES:
-            renderer = fhirrenderer.FHIRStructureDefinitionRenderer(
-                self.spec, self.settings
-            )
-            renderer.render()
+            classes.append(fhirrenderer.FHIRStructureDefinitionRenderer)
+            classes.append(fhirrenderer.FHIRValueSetRenderer)
+
+            if getattr(self.settings, "WRITE_ELEMENT_TABLE", False):
+                classes.append(fhirrenderer.FHIRElementTableRenderer)
+
+                if getattr(self.settings, "WRITE_SEARCH_PARAMETERS", False):
+                    classes.append(fhirrenderer.FHIRSearchParameterRenderer)
+
+                if getattr(self.settings, "WRITE_INVARIANTS", False):
+                    classes.append(fhirrenderer.FHIRInvariantRenderer)
+
+                if getattr(self.settings, "WRITE_BINDINGS", False):
+                    classes.append(fhirrenderer.FHIRBindingRenderer)
 
-            vsrenderer = fhirrenderer.FHIRValueSetRenderer(self.spec, self.settings)
-            vsrenderer.render()
+            if getattr(self.settings, "WRITE_REFERENCE_INDEX", False):
+                classes.append(fhirrenderer.FHIRReferenceIndexRenderer)
 
         if self.settings.WRITE_DEPENDENCIES:
-            renderer = fhirrenderer.FHIRDependencyRenderer(self.spec, self.settings)
-            renderer.render()
+            classes.append(fhirrenderer.FHIRDependencyRenderer)
 
         if self.settings.WRITE_UNITTESTS:
-            renderer = fhirrenderer.FHIRUnitTestRenderer(self.spec, self.settings)
+            classes.append(fhirrenderer.FHIRUnitTestRenderer)
+
+            if getattr(self.settings, "WRITE_BENCHMARKS", False):
+                classes.append(fhirrenderer.FHIRBenchmarkRenderer)
+
+        return [klass(self.spec, self.settings, analysis) for klass in classes]
+
+    def write(self):
+        """ """
+        for renderer in self.renderers(self.analyze()):
             renderer.render()
 
 
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Expands the ValueSets of the specification at generation time, from the
+composition rules (``include``/``exclude`` of concepts, filters and other
+value sets) applied to the CodeSystems shipped with the spec."""
+import typing
+
+from logger import logger
+
+__author__ = "Md Nazrul Islam <email2nazrul@gmail.com>"
+
+# (system, code) pairs of an expansion, in the order of the definitions
+Codes = typing.Tuple[typing.Tuple[str, str], ...]
+
+
+class Unexpandable(Exception):
+    """The value set needs a code system or a filter which is not available
+    at generation time (external terminologies, ``regex`` filters...)."""
+
+
+class CodeSystemHierarchy:
+    """The concepts of a code system with their parents, from the nesting
+    of the concepts and the ``parent``/``subsumedBy`` properties."""
+
+    def __init__(self, definition: typing.Dict[str, typing.Any]):
+        self.url: str = definition["url"]
+        self.parents: typing.Dict[str, typing.Set[str]] = dict()
+        self.properties: typing.Dict[str, typing.Dict[str, typing.Set[str]]] = dict()
+        self.collect(definition.get("concept", []), None)
+
+    def collect(self, concepts, parent: typing.Optional[str]):
+        """ """
+        for concept in concepts:
+            code = concept["code"]
+            parents = self.parents.setdefault(code, set())
+            properties = self.properties.setdefault(code, dict())
+            if parent is not None:
+                parents.add(parent)
+            for prop in concept.get("property", []):
+                value = None
+                for name, item in prop.items():
+                    if name.startswith("value"):
+                        value = str(item).lower() if name == "valueBoolean" else item
+                if value is None:
+                    continue
+                if prop["code"] in ("parent", "subsumedBy"):
+                    parents.add(value)
+                properties.setdefault(prop["code"], set()).add(value)
+            self.collect(concept.get("concept", []), code)
+
+    def codes(self) -> typing.Set[str]:
+        return set(self.parents)
+
+    def ordered(self, codes: typing.Set[str]) -> typing.List[str]:
+        """Returns codes in the order of the concepts of the code system."""
+        return [code for code in self.parents if code in codes]
+
+    def descendants(self, code: str) -> typing.Set[str]:
+        """Returns the codes having ``code`` as ancestor."""
+        children: typing.Dict[str, typing.Set[str]] = dict()
+        for child, parents in self.parents.items():
+            for parent in parents:
+                children.setdefault(parent, set()).add(child)
+        found: typing.Set[str] = set()
+        pending = [code]
+        while pending:
+            for child in children.get(pending.pop(), ()):
+                if child not in found:
+                    found.add(child)
+                    pending.append(child)
+        return found
+
+    def filtered(self, filter_: typing.Dict[str, str]) -> typing.Set[str]:
+        """Returns the codes matching a ``compose.include.filter``."""
+        prop, op, value = filter_.get("property"), filter_.get("op"), filter_["value"]
+        if prop == "concept" and op == "is-a":
+            return self.descendants(value) | ({value} & self.codes())
+        if prop == "concept" and op == "descendent-of":
+            return self.descendants(value)
+        if prop == "concept" and op == "is-not-a":
+            return self.codes() - self.descendants(value) - {value}
+        if prop == "concept" and op == "in":
+            return set(value.split(",")) & self.codes()
+        if op == "=":
+            return set(
+                [
+                    code
+                    for code, properties in self.properties.items()
+                    if value in properties.get(prop, ())
+                ]
+            )
+        if op == "exists":
+            present = value == "true"
+            return set(
+                [
+                    code
+                    for code, properties in self.properties.items()
+                    if (prop in properties) == present
+                ]
+            )
+        raise Unexpandable(f"filter {prop} {op} {value} on {self.url}")
+
+
+class ValueSetExpander:
+    """Expands value sets (by canonical url, with or without ``|version``)
+    into the ``(system, code)`` of their codes, in the order of the
+    composition rules and of the concepts of the code systems, memoized per
+    url."""
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.expansions: typing.Dict[str, typing.Optional[Codes]] = dict()
+        self.hierarchies: typing.Dict[str, CodeSystemHierarchy] = dict()
+        self.pending: typing.Set[str] = set()
+
+    def hierarchy(self, system: str) -> CodeSystemHierarchy:
+        """ """
+        if system not in self.hierarchies:
+            codesystem = self.spec.codesystems.get(system)
+            if codesystem is None:
+                raise Unexpandable(f"unknown code system {system}")
+            if codesystem.definition.get("content") != "complete":
+                raise Unexpandable(f"code system {system} is not complete")
+            self.hierarchies[system] = CodeSystemHierarchy(codesystem.definition)
+        return self.hierarchies[system]
+
+    def expand(self, url: str) -> typing.Optional[Codes]:
+        """Returns the expansion of a value set, None if it cannot be
+        expanded."""
+        url = url.split("|", 1)[0]
+        if url not in self.expansions:
+            try:
+                self.expansions[url] = self.compose(url)
+            except Unexpandable as exc:
+                logger.debug(f"ValueSet {url} is not expanded: {exc}")
+                self.expansions[url] = None
+        return self.expansions[url]
+
+    def compose(self, url: str) -> Codes:
+        """ """
+        valueset = self.spec.valuesets.get(url)
+        if valueset is None:
+            raise Unexpandable("unknown value set")
+        if url in self.pending:
+            raise Unexpandable("circular value set composition")
+        definition = valueset.definition
+        if "compose" not in definition:
+            contains = definition.get("expansion", {}).get("contains")
+            if contains is None:
+                raise Unexpandable("no composition")
+            return tuple(dict.fromkeys(self.contained(contains)))
+        self.pending.add(url)
+        try:
+            compose = definition["compose"]
+            # an ordered set
+            found: typing.Dict[typing.Tuple[str, str], None] = dict()
+            for include in compose.get("include", []):
+                found.update(dict.fromkeys(self.rule(include)))
+            for exclude in compose.get("exclude", []):
+                for pair in self.rule(exclude):
+                    found.pop(pair, None)
+        finally:
+            self.pending.discard(url)
+        return tuple(found)
+
+    def contained(self, contains) -> typing.List[typing.Tuple[str, str]]:
+        """ """
+        found = list()
+        for item in contains:
+            if item.get("code") and item.get("system"):
+                found.append((item["system"], item["code"]))
+            found.extend(self.contained(item.get("contains", [])))
+        return found
+
+    def rule(
+        self, rule: typing.Dict[str, typing.Any]
+    ) -> typing.List[typing.Tuple[str, str]]:
+        """Returns the codes of an ``include`` or ``exclude`` rule: the
+        intersection of its system part and of its value sets."""
+        found: typing.Optional[typing.List[typing.Tuple[str, str]]] = None
+        system = rule.get("system")
+        if system is not None:
+            if "concept" in rule:
+                codes = [concept["code"] for concept in rule["concept"]]
+            else:
+                hierarchy = self.hierarchy(system)
+                selected = hierarchy.codes()
+                for filter_ in rule.get("filter", []):
+                    selected &= hierarchy.filtered(filter_)
+                codes = hierarchy.ordered(selected)
+            found = [(system, code) for code in codes]
+        for url in rule.get("valueSet", []):
+            expansion = self.expand(url)
+            if expansion is None:
+                raise Unexpandable(f"value set {url} is not expanded")
+            if found is None:
+                found = list(expansion)
+            else:
+                allowed = set(expansion)
+                found = [pair for pair in found if pair in allowed]
+        return found or list()
+
+
+def required_bindings(spec) -> typing.Dict[str, str]:
+    """Returns ``element path: value set url`` of the required bindings of
+    the element definitions."""
+    bindings = dict()
+    for profile in spec.writable_profiles():
+        for element in profile.structure.differential:
+            binding = element.get("binding") or {}
+            if binding.get("strength") == "required" and binding.get("valueSet"):
+                bindings[element["path"]] = binding["valueSet"].split("|", 1)[0]
+    return bindings